@@ -1,4 +1,6 @@
+from app.api.schemas.shipment import ShipmentFields, TimelineMode
 from app.core.exception import BadCredentials, InvalidToken
+from app.core.principal import Principal, principal_cache
 from app.core.security import oauth2_scheme_seller, oauth2_scheme_partner
 from app.database.models import DeliveryPartner, Seller
 from app.database.redis import is_jti_blacklisted
@@ -9,13 +11,21 @@ from typing import Annotated
 from fastapi import BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.service.shipment_event import ShipmentEventService
-from app.utils import decode_access_token
+from app.service.webhook import WebhookService
+from app.utils import SUPPORT_SCOPE, decode_access_token
 from uuid import UUID
 from app.service.delivery_partner import DeliverPartnerService
 
 SessionDepends = Annotated[AsyncSession, Depends(get_session)]
 
 
+# sparse fieldsets of shipment responses
+def get_shipment_fields(
+    fields: str | None = None, timeline: TimelineMode = TimelineMode.full
+) -> ShipmentFields:
+    return ShipmentFields.parse(fields, timeline)
+
+
 # shipment service
 def get_shipment_service(session: SessionDepends, tasks: BackgroundTasks):
     return ShipmentService(
@@ -30,6 +40,11 @@ def get_seller_service(session: SessionDepends, tasks: BackgroundTasks):
     return SellerService(session=session, tasks=tasks)
 
 
+# webhook service
+def get_webhook_service(session: SessionDepends):
+    return WebhookService(session=session)
+
+
 # delivery partner service
 def get_delivery_partner_service(session: SessionDepends, tasks: BackgroundTasks):
     return DeliverPartnerService(session=session, tasks=tasks)
@@ -59,8 +74,8 @@ async def get_partner_access_token(
 async def get_current_seller(
     token_data: Annotated[dict, Depends(get_seller_access_token)],
     session: SessionDepends,
-) -> Seller:
-    seller = await session.get(Seller, UUID(token_data["user"]["id"]))
+) -> Principal:
+    seller = await principal_cache.get(session, Seller, UUID(token_data["user"]["id"]))
     if seller is None:
         raise BadCredentials()
     return seller
@@ -69,16 +84,44 @@ async def get_current_seller(
 async def get_current_partner(
     token_data: Annotated[dict, Depends(get_partner_access_token)],
     session: SessionDepends,
+) -> Principal:
+    partner = await principal_cache.get(
+        session, DeliveryPartner, UUID(token_data["user"]["id"])
+    )
+    if partner is None:
+        raise BadCredentials()
+    return partner
+
+
+# shipment search, sellers see their own shipments, support agents every seller's
+async def get_search_seller_id(
+    token_data: Annotated[dict, Depends(get_seller_access_token)],
+    session: SessionDepends,
+) -> UUID | None:
+    if token_data.get("scope") == SUPPORT_SCOPE:
+        return None
+    return (await get_current_seller(token_data, session)).id
+
+
+# full entity, only for routes that modify the user itself
+async def get_current_partner_entity(
+    principal: Annotated[Principal, Depends(get_current_partner)],
+    session: SessionDepends,
 ) -> DeliveryPartner:
-    partner = await session.get(DeliveryPartner, UUID(token_data["user"]["id"]))
+    partner = await session.get(DeliveryPartner, principal.id)
     if partner is None:
         raise BadCredentials()
     return partner
 
 
 # Guard
-SellerGuard = Annotated[Seller, Depends(get_current_seller)]
-PartnerGuard = Annotated[DeliveryPartner, Depends(get_current_partner)]
+SellerGuard = Annotated[Principal, Depends(get_current_seller)]
+PartnerGuard = Annotated[Principal, Depends(get_current_partner)]
+PartnerEntityGuard = Annotated[DeliveryPartner, Depends(get_current_partner_entity)]
+# seller the search is restricted to, None for support agents
+SearchScopeGuard = Annotated[UUID | None, Depends(get_search_seller_id)]
+
+ShipmentFieldsDepends = Annotated[ShipmentFields, Depends(get_shipment_fields)]
 
 # Service
 ShipmentServiceDepends = Annotated[ShipmentService, Depends(get_shipment_service)]
@@ -86,3 +129,4 @@ SellerServiceDepends = Annotated[SellerService, Depends(get_seller_service)]
 PartnerServiceDepends = Annotated[
     DeliverPartnerService, Depends(get_delivery_partner_service)
 ]
+WebhookServiceDepends = Annotated[WebhookService, Depends(get_webhook_service)]
@@ -1,11 +1,12 @@
 from fastapi import APIRouter
 
 from app.api.routers import delivery_partner
-from .routers import shipment, seller
+from .routers import metrics, shipment, seller
 
 master_router = APIRouter()
 
 # register all routes
 master_router.include_router(shipment.router)
 master_router.include_router(seller.router)
-master_router.include_router(delivery_partner.router)
\ No newline at end of file
+master_router.include_router(delivery_partner.router)
+master_router.include_router(metrics.router)
\ No newline at end of file
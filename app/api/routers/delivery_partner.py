@@ -1,21 +1,25 @@
+from itertools import groupby
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import EmailStr
 
 from app.api.schemas.delivery_partner import (
     DeliveryPartnerCreate,
     DeliveryPartnerUpdate,
+    WorkQueueStop,
 )
 from app.api.dependencies import (
+    PartnerEntityGuard,
     PartnerGuard,
     PartnerServiceDepends,
     get_partner_access_token,
 )
 from app.api.schemas.delivery_partner import DeliveryPartnerResponse
 from app.core.exception import BadRequest
+from app.database.models import ShipmentStatus
 from app.database.redis import add_jti_to_blacklist
-from app.helper.api import ApiResponse
+from app.helper.api import ApiResponse, CursorPagination
 
 router = APIRouter(prefix="/partner", tags=["partner"])
 
@@ -61,7 +65,7 @@ async def forgot_partner_password(
 ### update delivery partner
 @router.post("/", response_model=ApiResponse[DeliveryPartnerResponse])
 async def update_deliver_partner(
-    partner: PartnerGuard,
+    partner: PartnerEntityGuard,
     request: DeliveryPartnerUpdate,
     service: PartnerServiceDepends,
 ):
@@ -76,6 +80,29 @@ async def update_deliver_partner(
     return ApiResponse.success("partner updated successfully", result)
 
 
+### work queue, active shipments grouped by destination
+@router.get("/shipments", response_model=ApiResponse[list[WorkQueueStop]])
+async def get_partner_shipments(
+    partner: PartnerGuard,
+    service: PartnerServiceDepends,
+    status: ShipmentStatus | None = None,
+    cursor: str | None = None,
+    size: Annotated[int, Query(ge=1, le=200)] = 50,
+):
+    shipments, next_cursor = await service.work_queue(partner.id, status, cursor, size)
+
+    # a destination may continue on the next page
+    stops = [
+        {"destination": destination, "shipments": list(group)}
+        for destination, group in groupby(shipments, key=lambda shipment: shipment.destination)
+    ]
+    return ApiResponse.success(
+        "work queue",
+        stops,
+        CursorPagination(size=size, next_cursor=next_cursor),
+    )
+
+
 ### logout
 @router.get("/logout")
 async def logout_partner(
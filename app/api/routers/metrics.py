@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+
+from app.core.broadcast import broadcaster
+from app.core.logging import metrics as logging_metrics
+from app.core.resilience import breaker_metrics
+from app.worker.dispatch import dispatcher
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+# celery dispatch backpressure
+@router.get("/dispatch")
+async def get_dispatch_metrics() -> dict:
+    return dispatcher.metrics()
+
+
+# live tracking connections on this worker
+@router.get("/streams")
+async def get_stream_metrics() -> dict:
+    return {"connections": broadcaster.connections}
+
+
+# log records waiting for the writer thread, dropped and sampled out
+@router.get("/logging")
+async def get_logging_metrics() -> dict:
+    return logging_metrics()
+
+
+# circuit breakers of redis and the broker on this worker
+@router.get("/breakers")
+async def get_breaker_metrics() -> dict:
+    return breaker_metrics()
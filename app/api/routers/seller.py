@@ -1,22 +1,26 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
+from uuid import UUID
+from fastapi import APIRouter, Depends, Form, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.templating import Jinja2Templates
 from pydantic import EmailStr
 
 from app.api.dependencies import (
+    SellerGuard,
     SellerServiceDepends,
     SessionDepends,
+    WebhookServiceDepends,
     get_seller_access_token,
 )
 from app.api.schemas.seller import SellerCreate, SellerResponse
+from app.api.schemas.webhook import WebhookCreate, WebhookCreated, WebhookResponse
 from app.config import app_settings
 from app.core.exception import InvalidToken
 from app.database.models import Seller
 from app.database.redis import add_jti_to_blacklist
 from app.helper.api import ApiResponse
 from app.core.security import oauth2_scheme_seller
-from app.utils import TEMPLATE_DIR, decode_access_token
+from app.core.templating import template_response
+from app.utils import decode_access_token
 
 
 router = APIRouter(prefix="/seller", tags=["seller"])
@@ -65,15 +69,12 @@ async def forgot_seller_password(
 # form-reset
 @router.get("/reset-password")
 async def form_reset_seller_password(
-    request: Request,
     token: str,
     service: SellerServiceDepends,
 ):
-    templates = Jinja2Templates(directory=TEMPLATE_DIR / "password")
-    return templates.TemplateResponse(
-        request=request,
-        name="reset.html",
-        context={
+    return await template_response(
+        "password/reset.html",
+        {
             "reset_url": f"{app_settings.APP_DOMAIN}{router.prefix}/reset-password?token={token}",
         },
     )
@@ -82,17 +83,14 @@ async def form_reset_seller_password(
 # reset
 @router.post("/reset-password")
 async def submit_reset_seller_password(
-    request: Request,
     token: str,
     password: Annotated[str, Form()],
     service: SellerServiceDepends,
 ):
     res = await service.reset_password(token, password)
 
-    templates = Jinja2Templates(directory=TEMPLATE_DIR / "password")
-    return templates.TemplateResponse(
-        request=request,
-        name="reset_success.html" if res else "reset_failed.html",
+    return await template_response(
+        "password/reset_success.html" if res else "password/reset_failed.html"
     )
 
 
@@ -110,6 +108,40 @@ async def get_dashboard(
     return ApiResponse.success("dashboard", seller)
 
 
+# webhooks, shipment events are pushed in signed batches
+@router.post("/webhooks", response_model=ApiResponse[WebhookCreated])
+async def create_webhook(
+    body: WebhookCreate,
+    seller: SellerGuard,
+    service: WebhookServiceDepends,
+):
+    webhook = await service.create(seller, str(body.url))
+    return ApiResponse.success(
+        "webhook created, keep the secret to verify signatures",
+        WebhookCreated(
+            id=webhook.id,
+            url=webhook.url,
+            created_at=webhook.created_at,
+            secret=webhook.secret,
+        ),
+    )
+
+
+@router.get("/webhooks", response_model=ApiResponse[list[WebhookResponse]])
+async def get_webhooks(seller: SellerGuard, service: WebhookServiceDepends):
+    return ApiResponse.success("webhooks", await service.list(seller))
+
+
+@router.delete("/webhooks/{id}")
+async def delete_webhook(
+    id: UUID,
+    seller: SellerGuard,
+    service: WebhookServiceDepends,
+) -> dict[str, str]:
+    await service.delete(seller, id)
+    return {"detail": "webhook deleted"}
+
+
 # logout user
 @router.get("/logout")
 async def logout_seller(token_data: Annotated[dict, Depends(get_seller_access_token)]):
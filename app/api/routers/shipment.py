@@ -1,34 +1,42 @@
-from typing import Annotated
+import asyncio
+import json
+from typing import Annotated, AsyncIterator
 from uuid import UUID
-from fastapi import APIRouter, Form, Request
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Form, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import HTMLResponse, StreamingResponse
 
 from app.api.dependencies import (
     PartnerGuard,
+    SearchScopeGuard,
     SellerGuard,
     SessionDepends,
+    ShipmentFieldsDepends,
     ShipmentServiceDepends,
 )
 from app.api.schemas.shipment import (
     ShipmentCreate,
     ShipmentResponse,
     ShipmentReview,
+    ShipmentSearch,
     ShipmentUpdatePartial,
+    ShipmentView,
 )
 from app.config import app_settings
-from app.database.models import TagName
-from app.helper.api import ApiResponse
-from app.utils import TEMPLATE_DIR
+from app.core.broadcast import broadcaster
+from app.core.templating import template_response
+from app.database.models import Shipment, TagName
+from app.helper.api import ApiResponse, CursorPagination
 
 router = APIRouter(prefix="/shipment", tags=["shipment"])
 
-templates = Jinja2Templates(directory=TEMPLATE_DIR)
 
 
-@router.get("/", response_model=list[ShipmentResponse])
-async def get_shipment(_: SellerGuard, service: ShipmentServiceDepends):
-    return await service.list()
+# fields= and timeline= narrow the columns selected and the payload
+@router.get("/", response_model=list[ShipmentView], response_model_exclude_unset=True)
+async def get_shipment(
+    _: SellerGuard, service: ShipmentServiceDepends, fields: ShipmentFieldsDepends
+):
+    return await service.list(fields)
 
 
 @router.post("/", response_model=ShipmentResponse)
@@ -38,24 +46,39 @@ async def submit_shipment(
     return await service.add(body, seller_guard)
 
 
+# search, keyset paginated
+@router.get(
+    "/search",
+    response_model=ApiResponse[list[ShipmentView]],
+    response_model_exclude_unset=True,
+)
+async def search_shipments(
+    search: Annotated[ShipmentSearch, Query()],
+    service: ShipmentServiceDepends,
+    seller_id: SearchScopeGuard,
+):
+    shipments, next_cursor = await service.search(search, seller_id)
+    return ApiResponse.success(
+        "shipments found",
+        shipments,
+        CursorPagination(size=search.size, next_cursor=next_cursor),
+    )
+
+
 # track shipment
 @router.get("/tracking")
 async def get_shipment_tracking(
-    request: Request, id: str, service: ShipmentServiceDepends
+    id: str, service: ShipmentServiceDepends
 ):
     shipment = await service.get(UUID(id))
 
     context = shipment.model_dump()
     context["partner"] = shipment.delivery_partner.name
     context["status"] = shipment.status
-    context["timeline"] = shipment.timeline
-    context["timeline"].reverse()
+    # newest first, without reordering the loaded relationship
+    context["timeline"] = shipment.timeline[::-1]
 
-    return templates.TemplateResponse(
-        request=request,
-        name="track.html",
-        context=context,
-    )
+    return await template_response("track.html", context)
 
 
 # cancel
@@ -70,13 +93,11 @@ async def cancel_shipment(
 
 # review
 @router.get("/review")
-async def get_review(request: Request, token: str):
+async def get_review(token: str):
     context = {
         "review_url": f"{app_settings.APP_DOMAIN}/shipment/review?token={token}",
     }
-    return templates.TemplateResponse(
-        request=request, name="review.html", context=context
-    )
+    return await template_response("review.html", context)
 
 
 @router.post("/review")
@@ -108,18 +129,107 @@ async def remove_tag(
     shipment = await service.remove_tag(UUID(id), tag)
     return ApiResponse.success("tag removed successfully", shipment)
 
-@router.get("/tagged", response_model=ApiResponse[list[ShipmentResponse]])
+@router.get(
+    "/tagged",
+    response_model=ApiResponse[list[ShipmentView]],
+    response_model_exclude_unset=True,
+)
 async def get_tagged_shipments(
     tag_name: TagName,
+    service: ShipmentServiceDepends,
+    fields: ShipmentFieldsDepends,
+):
+    return ApiResponse.success("tagged shipments", await service.tagged(tag_name, fields))
+
+
+@router.get("/{id}", response_model=ShipmentView, response_model_exclude_unset=True)
+async def get_shipment_by_id(
+    id: str, service: ShipmentServiceDepends, fields: ShipmentFieldsDepends
+):
+    return await service.get_view(UUID(id), fields)
+
+
+def _not_in_snapshot(data: str, snapshot_ids: set[str]) -> bool:
+    # published between subscribing and loading the snapshot
+    return json.loads(data).get("id") not in snapshot_ids
+
+
+# live tracking, server sent events
+@router.get("/{id}/events/stream")
+async def stream_shipment_events(
+    id: UUID,
+    service: ShipmentServiceDepends,
     session: SessionDepends,
 ):
-    tag = await tag_name.tag(session)
-    return ApiResponse.success("tagged shipments", tag.shipments if tag else [])
+    # subscribed before the snapshot, an event committed meanwhile is in one of them
+    queue = broadcaster.open(id)
+    try:
+        shipment = await service.get(id)
+    except BaseException:
+        broadcaster.close(id, queue)
+        raise
+    snapshot = [event.model_dump_json() for event in shipment.timeline]
+    snapshot_ids = {str(event.id) for event in shipment.timeline}
+
+    # don't hold a pooled connection for the lifetime of the stream
+    await session.close()
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            for data in snapshot:
+                yield f"event: shipment_event\ndata: {data}\n\n"
+
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if _not_in_snapshot(data, snapshot_ids):
+                    yield f"event: shipment_event\ndata: {data}\n\n"
+        finally:
+            broadcaster.close(id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# live tracking, websocket
+@router.websocket("/{id}/events/ws")
+async def websocket_shipment_events(websocket: WebSocket, id: UUID, session: SessionDepends):
+    # subscribed before the snapshot, an event committed meanwhile is in one of them
+    async with broadcaster.subscribe(id) as queue:
+        shipment = await session.get(Shipment, id)
+        if shipment is None:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+
+        snapshot = [event.model_dump_json() for event in shipment.timeline]
+        snapshot_ids = {str(event.id) for event in shipment.timeline}
+        await session.close()
+
+        await websocket.accept()
 
+        async def send_events():
+            for data in snapshot:
+                await websocket.send_text(data)
+            while True:
+                data = await queue.get()
+                if _not_in_snapshot(data, snapshot_ids):
+                    await websocket.send_text(data)
 
-@router.get("/{id}", response_model=ShipmentResponse)
-async def get_shipment_by_id(id: str, service: ShipmentServiceDepends):
-    return await service.get(UUID(id))
+        sender = asyncio.create_task(send_events())
+        try:
+            # client messages are ignored, only used to detect disconnect
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
 
 
 # @router.put("/{id}", response_model=ShipmentResponse)
@@ -2,6 +2,8 @@ from typing import Sequence
 from uuid import UUID
 from pydantic import BaseModel, EmailStr, Field
 
+from app.api.schemas.shipment import ShipmentResponse
+
 
 class BaseDeliveryPartner(BaseModel):
     name: str
@@ -21,3 +23,9 @@ class DeliveryPartnerUpdate(BaseModel):
 
 class DeliveryPartnerResponse(BaseDeliveryPartner):
     id: UUID
+
+
+# shipments of the work queue sharing a destination zip code
+class WorkQueueStop(BaseModel):
+    destination: int
+    shipments: list[ShipmentResponse]
@@ -1,9 +1,11 @@
 from datetime import datetime
+from enum import Enum
 from uuid import UUID
 from fastapi.openapi.models import Tag
 from pydantic import BaseModel, EmailStr, Field
 
 from app.api.schemas.seller import SellerResponse
+from app.core.exception import BadRequest
 from app.database.models import ShipmentEvent, ShipmentStatus, TagName
 
 
@@ -44,6 +46,88 @@ class ShipmentResponse(BaseShipment):
     tags: list[TagResponse]
 
 
+class TimelineMode(str, Enum):
+    none = "none"
+    latest = "latest"
+    full = "full"
+
+
+# shipment columns that can be picked with fields=
+SHIPMENT_COLUMNS = frozenset(
+    {
+        "id",
+        "content",
+        "weight",
+        "destination",
+        "estimated_delivery",
+        "client_contact_email",
+        "client_contact_phone",
+    }
+)
+SHIPMENT_FIELDS = SHIPMENT_COLUMNS | {"status", "tags", "timeline"}
+# same as ShipmentResponse
+DEFAULT_SHIPMENT_FIELDS = SHIPMENT_FIELDS - {"status"}
+
+
+class ShipmentFields(BaseModel):
+    """Fields and timeline mode asked for by the client"""
+
+    selected: frozenset[str]
+    timeline: TimelineMode
+
+    @classmethod
+    def parse(cls, fields: str | None, timeline: TimelineMode) -> "ShipmentFields":
+        # comma separated, e.g. fields=id,status,estimated_delivery
+        selected = (
+            frozenset(name.strip() for name in fields.split(",") if name.strip())
+            if fields
+            else DEFAULT_SHIPMENT_FIELDS
+        )
+        if not selected <= SHIPMENT_FIELDS:
+            raise BadRequest()
+        if timeline == TimelineMode.none:
+            selected -= {"timeline"}
+        return cls(selected=selected, timeline=timeline)
+
+    @property
+    def full_timeline(self) -> bool:
+        return "timeline" in self.selected and self.timeline == TimelineMode.full
+
+    @property
+    def latest_event(self) -> bool:
+        # status and the latest mode come from one bulk query, not the timeline
+        return not self.full_timeline and bool({"status", "timeline"} & self.selected)
+
+
+class ShipmentSearch(BaseModel):
+    # matched against content, client email and client phone
+    q: str | None = Field(default=None, min_length=3, max_length=100)
+    # support agents only, seller tokens always search their own shipments
+    seller_id: UUID | None = Field(default=None)
+    partner_id: UUID | None = Field(default=None)
+    status: ShipmentStatus | None = Field(default=None)
+    destination: int | None = Field(default=None)
+    tag: TagName | None = Field(default=None)
+    cursor: str | None = Field(default=None)
+    size: int = Field(default=20, ge=1, le=100)
+    fields: str | None = Field(default=None)
+    timeline: TimelineMode = Field(default=TimelineMode.full)
+
+
+# sparse response, only the selected fields are set and serialized
+class ShipmentView(BaseModel):
+    id: UUID | None = None
+    status: ShipmentStatus | None = None
+    content: str | None = None
+    weight: float | None = None
+    destination: int | None = None
+    estimated_delivery: datetime | None = None
+    client_contact_email: EmailStr | None = None
+    client_contact_phone: str | None = None
+    timeline: list[ShipmentEvent] | None = None
+    tags: list[TagResponse] | None = None
+
+
 class ShipmentReview(BaseModel):
     rating: int = Field(ge=1, le=5)
     review: str | None = Field(default=None)
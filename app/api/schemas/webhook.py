@@ -0,0 +1,18 @@
+from datetime import datetime
+from uuid import UUID
+from pydantic import BaseModel, HttpUrl
+
+
+class WebhookCreate(BaseModel):
+    url: HttpUrl
+
+
+class WebhookResponse(BaseModel):
+    id: UUID
+    url: str
+    created_at: datetime
+
+
+# the secret is only returned when the webhook is created
+class WebhookCreated(WebhookResponse):
+    secret: str
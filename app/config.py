@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 _base_config = SettingsConfigDict(
@@ -8,6 +10,23 @@ class AppSettings(BaseSettings):
     APP_NAME:str = "FastShip"
     APP_DOMAIN:str = "http://localhost:8000"
 
+    # server, used by `python -m app.serve`
+    SERVER: Literal["uvicorn", "gunicorn"] = "uvicorn"
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    # 0 means one worker per cpu core
+    SERVER_WORKERS: int = 0
+    SERVER_KEEP_ALIVE: int = 5
+    SERVER_BACKLOG: int = 2048
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+
+    # html and mail templates, reload on change only while developing
+    TEMPLATE_AUTO_RELOAD: bool = False
+    # compiled template cache, a temporary directory when not set
+    TEMPLATE_CACHE_DIR: str | None = None
+
+    model_config = _base_config
+
 
 class DatabaseSettings(BaseSettings):
     POSTGRES_HOST: str
@@ -16,6 +35,10 @@ class DatabaseSettings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
 
+    POSTGRES_POOL_SIZE: int = 10
+    POSTGRES_MAX_OVERFLOW: int = 10
+    POSTGRES_POOL_RECYCLE: int = 1800
+
     REDIS_HOST: str
     REDIS_PORT: int
 
@@ -54,7 +77,152 @@ class NotificationSettings(BaseSettings):
     model_config = _base_config
 
 
+class AdmissionSettings(BaseSettings):
+    # max concurrent requests per route, keyed by "<METHOD> <path>"
+    ADMISSION_ROUTE_LIMITS: dict[str, int] = {"POST /shipment/": 32}
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_MAX_QUEUE_TIME: float = 0.5
+    ADMISSION_RETRY_AFTER: int = 1
+
+    # per seller token bucket
+    SELLER_RATE_LIMITED_ROUTES: list[str] = ["POST /shipment/"]
+    SELLER_RATE_LIMIT: float = 5.0
+    SELLER_RATE_BURST: int = 20
+
+    model_config = _base_config
+
+
+class OutboxSettings(BaseSettings):
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 0.5
+
+    model_config = _base_config
+
+
+class DispatchSettings(BaseSettings):
+    TASK_DISPATCH_QUEUE_SIZE: int = 1000
+    # block waits up to TASK_DISPATCH_BLOCK_TIMEOUT for room, then drops
+    TASK_DISPATCH_POLICY: Literal["block", "drop"] = "block"
+    TASK_DISPATCH_BLOCK_TIMEOUT: float = 0.1
+
+    model_config = _base_config
+
+
+class AssignmentSettings(BaseSettings):
+    ASSIGNMENT_STRATEGY: Literal["least_loaded", "weighted", "round_robin"] = "least_loaded"
+    # seconds before a zip code's partner capacity is reloaded from the database
+    ASSIGNMENT_INDEX_TTL: float = 30.0
+
+    model_config = _base_config
+
+
+class IdempotencySettings(BaseSettings):
+    IDEMPOTENCY_METHODS: list[str] = ["POST"]
+    # how long a stored response can be replayed
+    IDEMPOTENCY_TTL: int = 86400
+    # in flight lock, must outlive the slowest request
+    IDEMPOTENCY_LOCK_TTL: int = 30
+    # how long a concurrent duplicate waits for the first response
+    IDEMPOTENCY_WAIT: float = 10.0
+
+    model_config = _base_config
+
+
+class EtaSettings(BaseSettings):
+    # used when a lane has too few deliveries
+    ETA_DEFAULT_DAYS: float = 3.0
+    # share of shipments expected to arrive before the estimate
+    ETA_QUANTILE: float = 0.8
+    ETA_MIN_SAMPLES: int = 20
+    # seconds between reloads of the in memory lookup
+    ETA_RELOAD_INTERVAL: float = 300.0
+    ETA_REFRESH_BATCH_SIZE: int = 10000
+    # seconds, deliveries newer than this may still be uncommitted
+    ETA_REFRESH_LAG: float = 60.0
+
+    model_config = _base_config
+
+
+class WebhookSettings(BaseSettings):
+    # seconds events of one webhook are collected before a delivery
+    WEBHOOK_BATCH_WINDOW: float = 2.0
+    WEBHOOK_BATCH_SIZE: int = 100
+    WEBHOOK_TIMEOUT: float = 5.0
+    # exponential backoff, capped at WEBHOOK_BACKOFF_MAX seconds
+    WEBHOOK_MAX_RETRIES: int = 8
+    WEBHOOK_BACKOFF_MAX: int = 600
+    # seconds the webhooks of a seller are cached by the api
+    WEBHOOK_CACHE_TTL: float = 30.0
+    # local development only, lets webhooks target localhost and private networks
+    WEBHOOK_ALLOW_PRIVATE_TARGETS: bool = False
+
+    model_config = _base_config
+
+
+class OverdueSettings(BaseSettings):
+    # seconds between celery beat runs of the overdue scan
+    OVERDUE_SCAN_INTERVAL: float = 300.0
+    OVERDUE_BATCH_SIZE: int = 500
+    # first run only, how far back estimated deliveries are considered
+    OVERDUE_LOOKBACK_HOURS: float = 24.0
+
+    model_config = _base_config
+
+
+class WorkerSettings(BaseSettings):
+    # processes (or greenlets with gevent) per queue, started by `python -m app.worker`
+    WORKER_CRITICAL_CONCURRENCY: int = 4
+    WORKER_NOTIFICATIONS_CONCURRENCY: int = 4
+    WORKER_WEBHOOKS_CONCURRENCY: int = 8
+    WORKER_BULK_CONCURRENCY: int = 1
+    WORKER_POOL: Literal["prefork", "gevent", "solo", "threads"] = "prefork"
+
+    model_config = _base_config
+
+
+class LogSettings(BaseSettings):
+    LOG_LEVEL: str = "INFO"
+    # records waiting for the writer thread, more are dropped
+    LOG_QUEUE_SIZE: int = 10000
+    # repeats of the same warning or error let through per window
+    LOG_SAMPLE_WINDOW: float = 10.0
+    LOG_SAMPLE_BURST: int = 5
+    # every sql statement at INFO, debugging only
+    LOG_SQL: bool = False
+
+    model_config = _base_config
+
+
+class ResilienceSettings(BaseSettings):
+    # seconds a redis command may take in the request path
+    REDIS_TIMEOUT: float = 0.25
+    REDIS_CONNECT_TIMEOUT: float = 1.0
+    # broker connect, send and publish retry budget, off the event loop
+    BROKER_TIMEOUT: float = 2.0
+    # failures in a row that open a breaker, seconds before a probe goes through
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_TIMEOUT: float = 5.0
+    # token blacklist while redis is unavailable, false rejects every request with 503,
+    # true only rejects tokens logged out through this process, with several
+    # workers most revoked tokens are accepted again
+    BLACKLIST_FAIL_OPEN: bool = False
+    BLACKLIST_CACHE_SIZE: int = 10000
+
+    model_config = _base_config
+
+
 app_settings = AppSettings()
 db_settings = DatabaseSettings()
 security_settings = SecuritySettings()
 notification_settings = NotificationSettings()
+admission_settings = AdmissionSettings()
+outbox_settings = OutboxSettings()
+dispatch_settings = DispatchSettings()
+assignment_settings = AssignmentSettings()
+idempotency_settings = IdempotencySettings()
+eta_settings = EtaSettings()
+webhook_settings = WebhookSettings()
+overdue_settings = OverdueSettings()
+worker_settings = WorkerSettings()
+log_settings = LogSettings()
+resilience_settings = ResilienceSettings()
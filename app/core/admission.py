@@ -0,0 +1,150 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import admission_settings
+from app.core.exception import DependencyUnavailable
+from app.core.security import get_scope_user_id
+from app.database.redis import take_rate_limit_token
+
+
+class RouteLimiter:
+    """Bounded concurrency for a single route with queue-time based shedding"""
+
+    def __init__(self, concurrency: int, max_queue: int, max_queue_time: float):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+
+        self.active = 0
+        self.shed = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+        # moving average of how long an admitted request holds its slot
+        self._service_time = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def expected_wait(self) -> float:
+        return (self.waiting + 1) * self._service_time / self.concurrency
+
+    async def acquire(self) -> float | None:
+        """wait for a slot, return None when admitted or a retry-after in seconds when shed"""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            return None
+
+        # reject early when the queue is full or would not drain in time
+        expected_wait = self.expected_wait()
+        if self.waiting >= self.max_queue or expected_wait > self.max_queue_time:
+            self.shed += 1
+            return max(expected_wait, self.max_queue_time)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_queue_time)
+            return None
+        except asyncio.TimeoutError:
+            # slot handed over right at the deadline
+            if waiter.done() and not waiter.cancelled():
+                return None
+            self.shed += 1
+            return max(self.expected_wait(), self.max_queue_time)
+        except asyncio.CancelledError:
+            # slot already handed over, pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, service_time: float | None = None):
+        if service_time is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_time
+
+        # hand the slot directly to the next waiter, active count stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.active -= 1
+
+
+class AdmissionControlMiddleware:
+    """Per seller rate limiting and per route admission control"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.limiters = {
+            route: RouteLimiter(
+                concurrency=concurrency,
+                max_queue=admission_settings.ADMISSION_MAX_QUEUE,
+                max_queue_time=admission_settings.ADMISSION_MAX_QUEUE_TIME,
+            )
+            for route, concurrency in admission_settings.ADMISSION_ROUTE_LIMITS.items()
+        }
+        self.rate_limited_routes = set(admission_settings.SELLER_RATE_LIMITED_ROUTES)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route = f"{scope['method']} {scope['path']}"
+
+        if route in self.rate_limited_routes:
+            wait = await self._take_seller_token(scope)
+            if wait > 0:
+                response = self._reject(429, "Rate limit exceeded", wait)
+                return await response(scope, receive, send)
+
+        limiter = self.limiters.get(route)
+        if limiter is None:
+            return await self.app(scope, receive, send)
+
+        retry_after = await limiter.acquire()
+        if retry_after is not None:
+            response = self._reject(503, "Service overloaded", retry_after)
+            return await response(scope, receive, send)
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.monotonic() - start)
+
+    async def _take_seller_token(self, scope: Scope) -> float:
+        seller_id = get_scope_user_id(scope)
+        if seller_id is None:
+            # unauthenticated request, it will be rejected by the route guard
+            return 0
+
+        try:
+            return await take_rate_limit_token(
+                seller_id,
+                rate=admission_settings.SELLER_RATE_LIMIT,
+                burst=admission_settings.SELLER_RATE_BURST,
+            )
+        except DependencyUnavailable:
+            # fail open, rate limiting is best effort
+            return 0
+
+    def _reject(self, status_code: int, detail: str, retry_after: float) -> JSONResponse:
+        return JSONResponse(
+            status_code=status_code,
+            content={"detail": detail},
+            headers={
+                "Retry-After": str(
+                    max(math.ceil(retry_after), admission_settings.ADMISSION_RETRY_AFTER)
+                )
+            },
+        )
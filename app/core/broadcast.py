@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import weakref
+from collections import defaultdict
+from contextlib import asynccontextmanager, suppress
+from uuid import UUID
+
+from app.database.redis import SHIPMENT_EVENT_CHANNEL, shipment_event_pubsub
+
+logger = logging.getLogger(__name__)
+
+
+class ShipmentEventBroadcaster:
+    """Fan out shipment events from redis pub/sub to local stream connections
+
+    Each worker keeps one pattern subscription, every SSE / websocket
+    connection only gets an in memory queue. Queues are held weakly, a stream
+    that never started can't leave its queue behind.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: dict[str, weakref.WeakSet[asyncio.Queue[str]]] = defaultdict(
+            weakref.WeakSet
+        )
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._read())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def open(self, shipment_id: UUID) -> asyncio.Queue[str]:
+        """queue receiving the events published from now on, release it with close"""
+        queue: asyncio.Queue[str] = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[str(shipment_id)].add(queue)
+        return queue
+
+    def close(self, shipment_id: UUID, queue: asyncio.Queue[str]):
+        key = str(shipment_id)
+        if key in self._subscribers:
+            self._subscribers[key].discard(queue)
+            if not self._subscribers[key]:
+                del self._subscribers[key]
+
+    @asynccontextmanager
+    async def subscribe(self, shipment_id: UUID):
+        queue = self.open(shipment_id)
+        try:
+            yield queue
+        finally:
+            self.close(shipment_id, queue)
+
+    @property
+    def connections(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    async def _read(self):
+        while True:
+            pubsub = shipment_event_pubsub()
+            try:
+                await pubsub.psubscribe(f"{SHIPMENT_EVENT_CHANNEL}*")
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self._fan_out(
+                            message["channel"].removeprefix(SHIPMENT_EVENT_CHANNEL),
+                            message["data"],
+                        )
+            except Exception:
+                # the reader must outlive any failure, fan out stops with it
+                logger.exception("shipment event subscription lost, reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _fan_out(self, shipment_id: str, data: str):
+        for queue in self._subscribers.get(shipment_id, ()):
+            # slow consumer, drop its oldest event instead of blocking the others
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+
+broadcaster = ShipmentEventBroadcaster()
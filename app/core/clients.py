@@ -0,0 +1,33 @@
+from functools import cache
+from typing import TYPE_CHECKING
+
+from app.config import notification_settings
+
+if TYPE_CHECKING:
+    from fastapi_mail import FastMail
+    from twilio.rest import Client
+
+
+# mail and sms clients are shared by the api and the worker,
+# created on first use, not per request or when the worker boots
+@cache
+def get_fastmail() -> "FastMail":
+    from fastapi_mail import ConnectionConfig, FastMail
+
+    return FastMail(
+        ConnectionConfig(
+            **notification_settings.model_dump(
+                exclude={"TWILIO_AUTH_TOKEN", "TWILIO_SID", "TWILIO_PHONE_NUMBER"}
+            )
+        )
+    )
+
+
+@cache
+def get_twilio_client() -> "Client":
+    from twilio.rest import Client
+
+    return Client(
+        notification_settings.TWILIO_SID,
+        notification_settings.TWILIO_AUTH_TOKEN,
+    )
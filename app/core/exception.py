@@ -1,9 +1,11 @@
+import logging
+
 from fastapi import FastAPI, HTTPException, Request, Response, status
 from fastapi.exceptions import RequestValidationError, ResponseValidationError
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError
-from rich import print
-from rich.panel import Panel
+
+logger = logging.getLogger(__name__)
 
 class FastShipError(Exception):
     """Base Exception for all exception is fastship api"""
@@ -36,9 +38,25 @@ class DeliveryPartnerCapacityExceeded(FastShipError):
     """Exception when delivery partner capacity exceeded"""
     status_code = status.HTTP_400_BAD_REQUEST
 
+class WebhookTargetNotAllowed(FastShipError):
+    """Webhook url must resolve to a public address"""
+    status_code = status.HTTP_400_BAD_REQUEST
+
+class DependencyUnavailable(FastShipError):
+    """Service temporarily unavailable, try again later"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+def _log_handled(request: Request, exception: Exception):
+    # queued, written by the logging thread, repeats are sampled
+    logger.warning(
+        "handled %s",
+        exception.__class__.__name__,
+        extra={"path": request.url.path},
+    )
+
 def _get_handler(status:int, detail:str):
     def handler(request: Request, exception: Exception) -> Response:
-        print(Panel(f"Handled: {exception.__class__.__name__}"))
+        _log_handled(request, exception)
         raise HTTPException(
             status_code=status,
             detail=detail
@@ -55,7 +73,12 @@ def add_exception_handlers(app: FastAPI):
     # for internal server error
     @app.exception_handler(status.HTTP_500_INTERNAL_SERVER_ERROR)
     def internal_server_error_handler(request: Request, exception: Exception) -> Response:
-        print(Panel(f"Handled: {exception}"))
+        logger.error(
+            "unhandled %s",
+            exception.__class__.__name__,
+            exc_info=exception,
+            extra={"path": request.url.path},
+        )
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"detail": "Internal Server Error"}
@@ -64,7 +87,7 @@ def add_exception_handlers(app: FastAPI):
     # for validation error from pydantic
     @app.exception_handler(ResponseValidationError)
     def validation_error_response_handler(request: Request, exception: Exception) -> Response:
-        print(Panel(f"Handled: {exception}"))
+        _log_handled(request, exception)
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"detail": "Validation Error"}
@@ -72,7 +95,7 @@ def add_exception_handlers(app: FastAPI):
 
     @app.exception_handler(RequestValidationError)
     def validation_error_request_handler(request: Request, exception: Exception) -> Response:
-        print(Panel(f"Handled: {exception}"))
+        _log_handled(request, exception)
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"detail": "Validation Error"}
@@ -0,0 +1,176 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import time
+from uuid import uuid4
+
+from redis.exceptions import RedisError
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import idempotency_settings
+from app.core.exception import DependencyUnavailable
+from app.core.security import get_scope_user_id
+from app.database.redis import (
+    acquire_idempotency_lock,
+    get_idempotent_response,
+    release_idempotency_lock,
+    save_idempotent_response,
+)
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+
+
+class IdempotencyMiddleware:
+    """Replay the stored response of a request already made with the same Idempotency-Key
+
+    Concurrent duplicates wait for the first request to finish instead of
+    running the route again.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.methods = set(idempotency_settings.IDEMPOTENCY_METHODS)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            return await self.app(scope, receive, send)
+
+        idempotency_key = dict(scope["headers"]).get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            return await self.app(scope, receive, send)
+
+        # keys are scoped to the user, two sellers can't collide
+        key = hashlib.sha256(
+            b"|".join(
+                [
+                    (get_scope_user_id(scope) or "anonymous").encode(),
+                    scope["method"].encode(),
+                    scope["path"].encode(),
+                    idempotency_key,
+                ]
+            )
+        ).hexdigest()
+
+        # the body is read once, for the fingerprint, then handed to the route
+        body = await self._read_body(receive)
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        async def replay_receive() -> Message:
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        owner = str(uuid4())
+        try:
+            response = await self._wait_for_response(key, owner, fingerprint)
+        except (DependencyUnavailable, RedisError):
+            # fail open, process the request as if it had no key
+            return await self.app(scope, replay_receive, send)
+
+        if response is not None:
+            return await response(scope, receive, send)
+
+        status, headers, chunks = 500, [], []
+
+        async def capture_send(message: Message):
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status, headers = message["status"], message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await self._finish(key, owner, None)
+            raise
+
+        # server errors are not stored, the client may retry them
+        stored = None
+        if status < 500:
+            stored = json.dumps(
+                {
+                    "fingerprint": fingerprint,
+                    "status": status,
+                    "headers": [
+                        [name.decode("latin-1"), value.decode("latin-1")]
+                        for name, value in headers
+                    ],
+                    "body": base64.b64encode(b"".join(chunks)).decode(),
+                }
+            ).encode()
+        await self._finish(key, owner, stored)
+
+    async def _finish(self, key: str, owner: str, stored: bytes | None):
+        """store the response and release the lock, never raises
+
+        The response was already sent, a failure here must not turn it into
+        an error, a retry is processed again and the lock expires on its own.
+        """
+        try:
+            if stored is not None:
+                await save_idempotent_response(
+                    key, stored, idempotency_settings.IDEMPOTENCY_TTL
+                )
+        except (DependencyUnavailable, RedisError):
+            logger.warning("idempotent response not stored", exc_info=True)
+        finally:
+            try:
+                await release_idempotency_lock(key, owner)
+            except (DependencyUnavailable, RedisError):
+                # expires after IDEMPOTENCY_LOCK_TTL
+                logger.warning("idempotency lock not released", exc_info=True)
+
+    async def _wait_for_response(
+        self, key: str, owner: str, fingerprint: str
+    ) -> Response | None:
+        """stored response to replay, or None once this request holds the lock"""
+        deadline = time.monotonic() + idempotency_settings.IDEMPOTENCY_WAIT
+
+        while True:
+            stored = await get_idempotent_response(key)
+            if stored is not None:
+                return self._replay(json.loads(stored), fingerprint)
+
+            if await acquire_idempotency_lock(
+                key, owner, idempotency_settings.IDEMPOTENCY_LOCK_TTL
+            ):
+                return None
+
+            if time.monotonic() > deadline:
+                return JSONResponse(
+                    status_code=409,
+                    content={"detail": "Request with this Idempotency-Key is in progress"},
+                    headers={"Retry-After": "1"},
+                )
+
+            # first request still running, its lock is released even when it fails
+            await asyncio.sleep(0.05)
+
+    def _replay(self, stored: dict, fingerprint: str) -> Response:
+        if stored["fingerprint"] != fingerprint:
+            return JSONResponse(
+                status_code=422,
+                content={"detail": "Idempotency-Key was used with a different request"},
+            )
+
+        response = Response(
+            content=base64.b64decode(stored["body"]), status_code=stored["status"]
+        )
+        response.raw_headers = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in stored["headers"]
+        ] + [(b"idempotent-replayed", b"true")]
+        return response
+
+    async def _read_body(self, receive: Receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                return b"".join(chunks)
@@ -0,0 +1,233 @@
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from uuid import uuid4
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import log_settings
+
+# id of the request being handled, set by RequestContextMiddleware
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+logger = logging.getLogger("app.access")
+
+# attributes every LogRecord has, anything else was passed with `extra`
+_RECORD_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", None, None)).keys()
+    | {"message", "asctime", "request_id", "suppressed"}
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, `extra` fields are kept as keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id  # type:ignore
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed  # type:ignore
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Copy the request id to the record, in the thread that logs it"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class ErrorSampler(logging.Filter):
+    """Let the first `burst` repeats of a warning or error through per window
+
+    A repeat is the same logger, level, message and exception type.
+    The first record let through after a window carries how many were dropped.
+    """
+
+    def __init__(
+        self,
+        window: float = log_settings.LOG_SAMPLE_WINDOW,
+        burst: int = log_settings.LOG_SAMPLE_BURST,
+        max_keys: int = 1024,
+    ):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.max_keys = max_keys
+        self.suppressed = 0
+        self._lock = threading.Lock()
+        # key -> [window start, records in window, suppressed]
+        self._seen: dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+
+        exception = record.exc_info[0] if record.exc_info else None
+        key = (record.name, record.levelno, record.msg, exception, record.args)
+        try:
+            hash(key)
+        except TypeError:
+            # mapping args, compare the template only
+            key = key[:-1]
+        now = time.monotonic()
+
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is None or now - seen[0] >= self.window:
+                if len(self._seen) >= self.max_keys:
+                    self._seen.clear()
+                suppressed = seen[2] if seen else 0
+                self._seen[key] = [now, 1, 0]
+                record.suppressed = suppressed
+                return True
+
+            seen[1] += 1
+            if seen[1] <= self.burst:
+                return True
+            seen[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Drop records when the queue is full instead of blocking the caller"""
+
+    def __init__(self, records: queue.Queue):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # args are resolved now, they may change once the call returns,
+        # the traceback and json are rendered on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: QueueListener | None = None
+_handler: NonBlockingQueueHandler | None = None
+_sampler = ErrorSampler()
+
+
+def start_logging():
+    """route every log record through a queue, formatted and written by one thread"""
+    global _listener, _handler
+
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=log_settings.LOG_QUEUE_SIZE))
+    _handler.addFilter(RequestIdFilter())
+    _handler.addFilter(_sampler)
+
+    root = logging.getLogger()
+    root.setLevel(log_settings.LOG_LEVEL)
+    root.addHandler(_handler)
+    logging.getLogger("sqlalchemy.engine").setLevel(
+        logging.INFO if log_settings.LOG_SQL else logging.WARNING
+    )
+
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)  # type:ignore
+    _listener.start()
+
+
+def stop_logging():
+    """write out queued records and stop the writer thread"""
+    global _listener, _handler
+
+    if _listener is None:
+        return
+
+    logging.getLogger().removeHandler(_handler)  # type:ignore
+    _listener.stop()
+    _listener = None
+    _handler = None
+
+
+def metrics() -> dict:
+    return {
+        "running": _listener is not None,
+        "queue_depth": _handler.queue.qsize() if _handler else 0,  # type:ignore
+        "queue_size": log_settings.LOG_QUEUE_SIZE,
+        "dropped": _handler.dropped if _handler else 0,
+        "suppressed": _sampler.suppressed,
+    }
+
+
+class RequestContextMiddleware:
+    """Tag the request with an id for log correlation and write the access log
+
+    The id comes from the X-Request-ID header when the client or proxy sends
+    one and is returned in the response.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        id = Headers(scope=scope).get("x-request-id") or uuid4().hex
+        token = request_id.set(id)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_id(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            client = scope.get("client")
+            logger.info(
+                "%s %s %d",
+                scope["method"],
+                scope["path"],
+                status_code,
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status_code": status_code,
+                    "client": client[0] if client else None,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                },
+            )
+            request_id.reset(token)
@@ -3,7 +3,9 @@ from fastapi.responses import JSONResponse
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 
-from app.worker.tasks import add_log
+from app.core.admission import AdmissionControlMiddleware
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.logging import RequestContextMiddleware
 
 
 def set_middlware(app:FastAPI):
@@ -17,15 +19,6 @@ def set_middlware(app:FastAPI):
     )
 
     # add custom middleware
-    class LoggingMiddleware(BaseHTTPMiddleware):
-        async def dispatch(self, request:Request, call_next):
-            method = request.method
-            url = request.url.path
-            client = request.client
-            add_log.delay(f"{method} {url} {client}")
-            response = await call_next(request)
-            return response
-
     class PublicMiddleware(BaseHTTPMiddleware):
         async def dispatch(self, request:Request, call_next):
             if request.url.path == "/shipment/":
@@ -37,5 +30,13 @@ def set_middlware(app:FastAPI):
             return await call_next(request)
 
     
-    app.add_middleware(LoggingMiddleware)
-    # app.add_middleware(PublicMiddleware)
\ No newline at end of file
+    # app.add_middleware(PublicMiddleware)
+
+    # replay retried requests instead of running them again
+    app.add_middleware(IdempotencyMiddleware)
+
+    # outermost, shed load before any other work is done
+    app.add_middleware(AdmissionControlMiddleware)
+
+    # request id and access log, also for shed requests
+    app.add_middleware(RequestContextMiddleware)
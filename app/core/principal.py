@@ -0,0 +1,62 @@
+import time
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.database.models import DeliveryPartner, Seller
+
+
+class Principal(BaseModel):
+    """Authenticated seller or partner, without its relationships"""
+
+    model_config = ConfigDict(frozen=True)
+
+    id: UUID
+    name: str
+    zip_code: int | None = None
+
+
+class PrincipalCache:
+    """Short lived cache of the few columns a principal needs"""
+
+    def __init__(self, ttl: float = 30.0, max_size: int = 10_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: dict[tuple[str, UUID], tuple[float, Principal]] = {}
+
+    async def get(
+        self, session: AsyncSession, model: type[Seller | DeliveryPartner], id: UUID
+    ) -> Principal | None:
+        key = (model.__tablename__, id)
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        zip_code = model.zip_code if model is Seller else literal(None)  # type:ignore
+        row = (
+            await session.execute(
+                select(model.name, zip_code).where(model.id == id)  # type:ignore
+            )
+        ).first()
+
+        # deleted users are not cached, the next request checks again
+        if row is None:
+            self._entries.pop(key, None)
+            return None
+
+        principal = Principal(id=id, name=row[0], zip_code=row[1])
+
+        if len(self._entries) >= self.max_size:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (time.monotonic() + self.ttl, principal)
+
+        return principal
+
+    def invalidate(self, model: type[Seller | DeliveryPartner], id: UUID):
+        self._entries.pop((model.__tablename__, id), None)
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+from enum import Enum
+from typing import Awaitable, Callable, TypeVar
+
+from app.config import resilience_settings
+from app.core.exception import DependencyUnavailable
+
+T = TypeVar("T")
+
+
+class BreakerState(str, Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+# every breaker of this process, by dependency name
+breakers: dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitBreaker:
+    """Timeout and circuit breaker around the calls to one dependency
+
+    Closed, calls go through and `failure_threshold` failures in a row open it.
+    Open, calls fail at once with DependencyUnavailable for `reset_timeout` seconds.
+    Half open, one probe call at a time, success closes it and failure opens it again.
+    The state is shared by the event loop and the celery producer threads.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        errors: tuple[type[BaseException], ...] = (OSError,),
+        failure_threshold: int = resilience_settings.BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = resilience_settings.BREAKER_RESET_TIMEOUT,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.errors = errors
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = BreakerState.closed
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.opened = 0
+
+        breakers[name] = self
+
+    def allow(self) -> bool:
+        """whether a call may be made now, a half open breaker lets one probe through"""
+        with self._lock:
+            if self.state == BreakerState.open:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = BreakerState.half_open
+
+            if self.state == BreakerState.half_open:
+                if self._probing:
+                    self.rejected += 1
+                    return False
+                self._probing = True
+
+            self.calls += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self.state = BreakerState.closed
+
+    def record_failure(self, timeout: bool = False):
+        with self._lock:
+            self.failed += 1
+            self.timeouts += timeout
+            self.failures += 1
+
+            probe, self._probing = self._probing, False
+            if probe or self.failures >= self.failure_threshold:
+                if self.state != BreakerState.open:
+                    self.opened += 1
+                self.state = BreakerState.open
+                self._opened_at = time.monotonic()
+
+    def _release_probe(self):
+        with self._lock:
+            self._probing = False
+
+    async def call(self, operation: Callable[[], Awaitable[T]]) -> T:
+        """await the operation within the timeout, DependencyUnavailable when it can't"""
+        if not self.allow():
+            raise DependencyUnavailable(self.name)
+
+        try:
+            async with asyncio.timeout(self.timeout):
+                result = await operation()
+        except TimeoutError as error:
+            self.record_failure(timeout=True)
+            raise DependencyUnavailable(self.name) from error
+        except self.errors as error:
+            self.record_failure()
+            raise DependencyUnavailable(self.name) from error
+        except BaseException:
+            # cancelled by the caller, says nothing about the dependency
+            self._release_probe()
+            raise
+
+        self.record_success()
+        return result
+
+    def run(self, operation: Callable[[], T]) -> T:
+        """blocking variant, the timeout has to be enforced by the client itself"""
+        if not self.allow():
+            raise DependencyUnavailable(self.name)
+
+        try:
+            result = operation()
+        except self.errors as error:
+            self.record_failure(timeout=isinstance(error, TimeoutError))
+            raise DependencyUnavailable(self.name) from error
+        except BaseException:
+            self._release_probe()
+            raise
+
+        self.record_success()
+        return result
+
+    def metrics(self) -> dict:
+        return {
+            "state": self.state.value,
+            "failures": self.failures,
+            "calls": self.calls,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+
+def breaker_metrics() -> dict[str, dict]:
+    return {name: breaker.metrics() for name, breaker in breakers.items()}
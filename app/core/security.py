@@ -1,6 +1,7 @@
 from typing import Annotated
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, HTTPBearer
+from starlette.types import Scope
 
 from app.core.exception import InvalidToken
 from app.utils import decode_access_token
@@ -24,4 +25,16 @@ class AccessTokenBearer(HTTPBearer):
 
 
 access_token_bearer = AccessTokenBearer()
+
+
+# user id of the bearer token, for middlewares running before the route guards
+def get_scope_user_id(scope: Scope) -> str | None:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            data = decode_access_token(token)
+            return data["user"]["id"] if data else None
+    return None
 Annotated[dict, Depends(access_token_bearer)]
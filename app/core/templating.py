@@ -0,0 +1,40 @@
+from functools import cache
+
+from fastapi.responses import HTMLResponse
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+from app.config import app_settings
+from app.utils import TEMPLATE_DIR
+
+
+@cache
+def get_environment() -> Environment:
+    """One jinja environment per process, pages and mails share its template cache"""
+    return Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=select_autoescape(["html"]),
+        # compiled templates survive restarts, a new process skips the parsing
+        bytecode_cache=FileSystemBytecodeCache(app_settings.TEMPLATE_CACHE_DIR),
+        # stat every template on each render only while developing
+        auto_reload=app_settings.TEMPLATE_AUTO_RELOAD,
+        enable_async=True,
+    )
+
+
+def precompile_templates() -> int:
+    """compile every template now instead of on the first request or mail"""
+    environment = get_environment()
+    names = environment.list_templates(extensions=["html"])
+    for name in names:
+        environment.get_template(name)
+    return len(names)
+
+
+async def render_template(name: str, context: dict | None = None) -> str:
+    return await get_environment().get_template(name).render_async(context or {})
+
+
+async def template_response(
+    name: str, context: dict | None = None, status_code: int = 200
+) -> HTMLResponse:
+    return HTMLResponse(await render_template(name, context), status_code=status_code)
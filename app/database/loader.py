@@ -0,0 +1,133 @@
+import asyncio
+from collections import defaultdict
+from typing import Awaitable, Callable, Generic, Hashable, Iterable, Sequence, TypeVar
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import SQLModel, col, select
+
+from app.database.models import Shipment, ShipmentEvent, ShipmentTag, Tag
+from app.database.queries import ids_param, latest_events
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class DataLoader(Generic[K, V]):
+    """Merge every load made in the same event loop tick into one batch call
+
+    Results are cached for the lifetime of the loader, one request.
+    """
+
+    def __init__(self, batch: Callable[[list[K]], Awaitable[dict[K, V]]]):
+        self._batch = batch
+        self._futures: dict[K, asyncio.Future[V | None]] = {}
+        self._pending: list[K] = []
+
+    async def load(self, key: K) -> V | None:
+        future = self._futures.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._futures[key] = future
+            self._pending.append(key)
+            # first key of this tick, dispatch once the other callers queued theirs
+            if len(self._pending) == 1:
+                asyncio.get_running_loop().call_soon(self._dispatch)
+        return await future
+
+    async def load_many(self, keys: Iterable[K]) -> list[V | None]:
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    def prime(self, key: K, value: V):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        self._futures[key] = future
+
+    def clear(self, key: K):
+        self._futures.pop(key, None)
+
+    def _dispatch(self):
+        keys, self._pending = self._pending, []
+        asyncio.ensure_future(self._resolve(keys))
+
+    async def _resolve(self, keys: list[K]):
+        try:
+            values = await self._batch(keys)
+        except Exception as error:
+            for key in keys:
+                # cleared, a later load tries again
+                future = self._futures.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(error)
+            return
+
+        for key in keys:
+            future = self._futures.get(key)
+            if future is not None and not future.done():
+                future.set_result(values.get(key))
+
+
+class Loaders:
+    """Batching loaders of one request, shared through the session"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        # an AsyncSession runs one query at a time, batches of different loaders queue here
+        self._lock = asyncio.Lock()
+
+        self.tag = DataLoader[UUID, Tag](self._by_id(Tag))
+        self.latest_event = DataLoader[UUID, ShipmentEvent](self._latest_events)
+
+    def _by_id(self, model: type[SQLModel]) -> Callable[[list[UUID]], Awaitable[dict]]:
+        query = (
+            select(model)
+            .where(model.id == ids_param())  # type:ignore
+            # relationships are loaded through loaders too, never implicitly
+            .options(raiseload("*"))
+        )
+
+        async def batch(ids: list[UUID]) -> dict:
+            async with self._lock:
+                entities = await self.session.scalars(query, {"ids": ids})
+                return {entity.id: entity for entity in entities}  # type:ignore
+
+        return batch
+
+    async def _latest_events(self, shipment_ids: list[UUID]) -> dict:
+        async with self._lock:
+            return await latest_events(self.session, shipment_ids)
+
+    async def attach_tags(self, shipments: Sequence[Shipment]):
+        """set the tags of many shipments with one link query and one tag batch"""
+        if not shipments:
+            return
+
+        async with self._lock:
+            links = (
+                await self.session.execute(
+                    select(ShipmentTag.shipment_id, ShipmentTag.tag_id).where(
+                        col(ShipmentTag.shipment_id) == ids_param()
+                    ),
+                    {"ids": [shipment.id for shipment in shipments]},
+                )
+            ).all()
+
+        tag_ids: dict[UUID, list[UUID]] = defaultdict(list)
+        for shipment_id, tag_id in links:
+            tag_ids[shipment_id].append(tag_id)
+
+        unique_ids = list({tag_id for _, tag_id in links})
+        tags = dict(zip(unique_ids, await self.tag.load_many(unique_ids)))
+        for shipment in shipments:
+            set_committed_value(
+                shipment, "tags", [tags[tag_id] for tag_id in tag_ids[shipment.id]]
+            )
+
+
+def loaders(session: AsyncSession) -> Loaders:
+    """loaders of the request owning the session"""
+    if "loaders" not in session.info:
+        session.info["loaders"] = Loaders(session)
+    return session.info["loaders"]
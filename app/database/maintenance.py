@@ -0,0 +1,355 @@
+"""Database maintenance commands
+
+    python -m app.database.maintenance create-partitions --months 3
+    python -m app.database.maintenance archive --days 90
+    python -m app.database.maintenance explain
+    python -m app.database.maintenance refresh-eta
+    python -m app.database.maintenance scan-overdue
+"""
+import argparse
+import asyncio
+import json
+from datetime import date, datetime, timedelta
+from uuid import UUID, uuid4
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import with_parent
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlmodel import select
+
+from app.database.models import (
+    DeliveryPartner,
+    JobWatermark,
+    Review,
+    Seller,
+    Shipment,
+    ShipmentEvent,
+    TagName,
+)
+from app.database.session import dispose_engine, get_engine
+
+
+def _month(day: date, months: int = 0) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+async def _create_partition(
+    conn: AsyncConnection, parent: str, name: str, start: date, end: date
+) -> bool:
+    exists = await conn.scalar(text("SELECT to_regclass(:name)"), {"name": name})
+    if exists:
+        return False
+
+    await conn.execute(
+        text(
+            f"CREATE TABLE {name} PARTITION OF {parent} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+    )
+    return True
+
+
+async def create_event_partitions(conn: AsyncConnection, months: int) -> list[str]:
+    """create monthly shipment event partitions up to `months` ahead"""
+    created = []
+    current = _month(date.today())
+    for step in range(months + 1):
+        start = _month(current, step)
+        name = f"shipment_event_p{start:%Y_%m}"
+        if await _create_partition(conn, "shipment_event", name, start, _month(start, 1)):
+            created.append(name)
+    return created
+
+
+async def create_archive_partitions(conn: AsyncConnection, since: date) -> list[str]:
+    """create yearly archive partitions from `since` up to next year"""
+    created = []
+    for year in range(since.year, date.today().year + 2):
+        name = f"shipment_event_archive_p{year}"
+        if await _create_partition(
+            conn, "shipment_event_archive", name, date(year, 1, 1), date(year + 1, 1, 1)
+        ):
+            created.append(name)
+    return created
+
+
+# next batch of shipments closed before the cutoff, in (closed_at, id) order from
+# the last one done, read through ix_shipment_closed instead of aggregating the
+# event table. The latest event stays hot so status and tracking keep working,
+# the rest of the timeline is moved.
+_ARCHIVE_BATCH = text("""
+    WITH closed AS (
+        SELECT id AS shipment_id, closed_at
+        FROM shipment
+        WHERE closed_at < :cutoff
+          AND (closed_at, id) > (:after_closed_at, :after_id)
+        ORDER BY closed_at, id
+        LIMIT :batch_size
+    ),
+    latest AS (
+        SELECT DISTINCT ON (event.shipment_id) event.id
+        FROM shipment_event event
+        JOIN closed USING (shipment_id)
+        ORDER BY event.shipment_id, event.created_at DESC
+    ),
+    moved AS (
+        DELETE FROM shipment_event event
+        USING closed
+        WHERE event.shipment_id = closed.shipment_id
+          AND event.id NOT IN (SELECT id FROM latest)
+        RETURNING event.id, event.created_at, event.location, event.status,
+                  event.description, event.shipment_id
+    ),
+    archived AS (
+        INSERT INTO shipment_event_archive
+            (id, created_at, location, status, description, shipment_id)
+        SELECT * FROM moved
+        RETURNING 1
+    )
+    SELECT last.closed_at, last.shipment_id, (SELECT count(*) FROM archived) AS moved
+    FROM (
+        SELECT closed_at, shipment_id FROM closed
+        ORDER BY closed_at DESC, shipment_id DESC
+        LIMIT 1
+    ) last
+""")
+
+ARCHIVE_WATERMARK = "shipment_event_archive"
+
+
+async def archive_closed_shipments(days: int, batch_size: int) -> int:
+    """move events of shipments closed more than `days` ago to the archive"""
+    cutoff = datetime.now() - timedelta(days=days)
+
+    async with get_engine().begin() as conn:
+        oldest = await conn.scalar(text("SELECT min(created_at) FROM shipment_event"))
+        await create_archive_partitions(conn, (oldest or datetime.now()).date())
+
+        # shipments closed before the previous cutoff are archived already
+        since = await conn.scalar(
+            select(JobWatermark.value).where(JobWatermark.name == ARCHIVE_WATERMARK)
+        )
+
+    after = (since or datetime.min, UUID(int=0))
+    total = 0
+    while True:
+        # one transaction per batch keeps locks and wal bursts short
+        async with get_engine().begin() as conn:
+            last = (
+                await conn.execute(
+                    _ARCHIVE_BATCH,
+                    {
+                        "cutoff": cutoff,
+                        "after_closed_at": after[0],
+                        "after_id": after[1],
+                        "batch_size": batch_size,
+                    },
+                )
+            ).first()
+
+        if last is None:
+            break
+        total += last.moved
+        after = (last.closed_at, last.shipment_id)
+
+    async with get_engine().begin() as conn:
+        await conn.execute(
+            insert(JobWatermark)
+            .values(name=ARCHIVE_WATERMARK, value=cutoff)
+            .on_conflict_do_update(
+                index_elements=[JobWatermark.name], set_={"value": cutoff}
+            )
+        )
+    return total
+
+
+class _Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Executable):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element: _Explain, compiler, **kw) -> str:
+    # the statement keeps its bind parameters, values are sent as in the services
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}"
+
+
+def hot_queries() -> dict[str, tuple[Executable, dict, tuple[str, ...]]]:
+    """statements the services run on every request, their parameters and the
+    indexes each plan must use"""
+    from app.api.schemas.shipment import ShipmentSearch
+    from app.database.queries import latest_events_query
+    from app.service.delivery_partner import partner_slots_query, work_queue_query
+    from app.service.overdue import due_query
+    from app.service.shipment import search_query, tagged_query
+    from app.service.user import email_query
+
+    shipment = Shipment(id=uuid4())
+    since = datetime.now() - timedelta(days=1)
+    return {
+        "seller by email": (
+            email_query(Seller, "seller@fastship.com"), {}, ("ix_seller_email",)
+        ),
+        "partner by email": (
+            email_query(DeliveryPartner, "partner@fastship.com"),
+            {},
+            ("ix_delivery_partner_email",),
+        ),
+        "shipments of seller": (
+            select(Shipment).where(with_parent(Seller(id=uuid4()), Seller.shipments)),
+            {},
+            ("ix_shipment_seller_id",),
+        ),
+        "shipment timeline": (
+            select(ShipmentEvent).where(with_parent(shipment, Shipment.timeline)),
+            {},
+            ("ix_shipment_event_shipment_id",),
+        ),
+        "latest events": (
+            latest_events_query(),
+            {"ids": [uuid4() for _ in range(20)]},
+            ("ix_shipment_event_shipment_id",),
+        ),
+        "shipment review": (
+            select(Review).where(with_parent(shipment, Shipment.review)),
+            {},
+            ("ix_review_shipment_id",),
+        ),
+        "shipment search": (
+            search_query(ShipmentSearch(q="fastship"), None),
+            {},
+            tuple(
+                f"ix_shipment_{column}_trgm"
+                for column in ("content", "client_contact_email", "client_contact_phone")
+            ),
+        ),
+        "shipments of tag": (
+            tagged_query(TagName.EXPRESS), {}, ("ix_shipment_tag_tag_id",)
+        ),
+        "partner work queue": (
+            work_queue_query(uuid4(), None, None, 50),
+            {},
+            ("ix_shipment_delivery_partner_queue",),
+        ),
+        "partner slots": (
+            partner_slots_query(None, uuid4()),
+            {},
+            ("delivery_partner_pkey", "ix_shipment_delivery_partner_queue"),
+        ),
+        "overdue scan": (
+            due_query(since, datetime.now(), 500),
+            {},
+            ("ix_shipment_open_estimated_delivery",),
+        ),
+        "archive batch": (
+            _ARCHIVE_BATCH,
+            {
+                "cutoff": datetime.now() - timedelta(days=90),
+                "after_closed_at": datetime.min,
+                "after_id": UUID(int=0),
+                "batch_size": 1000,
+            },
+            ("ix_shipment_closed", "ix_shipment_event_shipment_id"),
+        ),
+    }
+
+
+# a partitioned index and the indexes of its partitions
+_INDEX_TREE = text("""
+    WITH RECURSIVE tree(oid) AS (
+        SELECT CAST(to_regclass(:name) AS oid)
+        UNION ALL
+        SELECT inhrelid FROM pg_inherits JOIN tree ON inhparent = tree.oid
+    )
+    SELECT CAST(CAST(oid AS regclass) AS text) FROM tree WHERE oid IS NOT NULL
+""")
+
+
+def _index_names(plan: dict) -> set[str]:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= _index_names(child)
+    return names
+
+
+async def explain_hot_queries() -> dict[str, list[str]]:
+    """expected indexes missing from the plan of every hot query, with the
+    default planner settings so plans only match production on realistic data"""
+    results = {}
+    async with get_engine().connect() as conn:
+        for name, (statement, params, indexes) in hot_queries().items():
+            plan = (await conn.execute(_Explain(statement), params)).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            used = _index_names(plan[0]["Plan"])
+
+            missing = []
+            for index in indexes:
+                tree = set((await conn.execute(_INDEX_TREE, {"name": index})).scalars())
+                if not tree & used:
+                    missing.append(index)
+            results[name] = missing
+    return results
+
+
+async def _main(args: argparse.Namespace):
+    if args.command == "create-partitions":
+        async with get_engine().begin() as conn:
+            created = await create_event_partitions(conn, args.months)
+            created += await create_archive_partitions(conn, date.today())
+        print(f"created {len(created)} partitions {created}")
+
+    elif args.command == "archive":
+        moved = await archive_closed_shipments(args.days, args.batch_size)
+        print(f"archived {moved} shipment events")
+
+    elif args.command == "refresh-eta":
+        from app.service.eta import refresh_transit_stats
+
+        counted = await refresh_transit_stats(args.batch_size)
+        print(f"added {counted} deliveries to transit stats")
+
+    elif args.command == "scan-overdue":
+        from app.service.overdue import scan_overdue_shipments
+
+        overdue = await scan_overdue_shipments(args.batch_size)
+        print(f"{overdue} shipments overdue")
+
+    elif args.command == "explain":
+        results = await explain_hot_queries()
+        for name, missing in results.items():
+            print(f"{'MISSING' if missing else 'ok':<10}{name} {', '.join(missing)}")
+        await dispose_engine()
+        if any(results.values()):
+            raise SystemExit(1)
+        return
+
+    await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.database.maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    partitions = commands.add_parser("create-partitions")
+    partitions.add_argument("--months", type=int, default=3)
+
+    archive = commands.add_parser("archive")
+    archive.add_argument("--days", type=int, default=90)
+    archive.add_argument("--batch-size", type=int, default=1000)
+
+    commands.add_parser("explain")
+
+    refresh_eta = commands.add_parser("refresh-eta")
+    refresh_eta.add_argument("--batch-size", type=int, default=10000)
+
+    scan_overdue = commands.add_parser("scan-overdue")
+    scan_overdue.add_argument("--batch-size", type=int, default=500)
+
+    asyncio.run(_main(parser.parse_args()))
@@ -3,18 +3,20 @@ from pydantic import EmailStr
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Column, Field, Relationship, SQLModel, col, select
 from enum import Enum
-from uuid import uuid4, UUID
+from uuid import UUID
 from sqlalchemy.dialects import postgresql
-from sqlalchemy import ARRAY, INTEGER
+from sqlalchemy import ARRAY, INTEGER, Index, text
 from collections.abc import Sequence
 
+from app.database.ids import uuid7
+
 
 # MANY TO MANY
 class ShipmentTag(SQLModel, table=True):
     __tablename__ = "shipment_tag"  # type:ignore
 
     shipment_id: UUID = Field(foreign_key="shipment.id", primary_key=True)
-    tag_id: UUID = Field(foreign_key="tag.id", primary_key=True)
+    tag_id: UUID = Field(foreign_key="tag.id", primary_key=True, index=True)
 
 
 class TagName(str, Enum):
@@ -41,11 +43,49 @@ class ShipmentStatus(str, Enum):
     cancelled = "cancelled"
 
 
+# a shipment is active until its timeline reaches one of these
+CLOSED_STATUSES = (ShipmentStatus.delivered, ShipmentStatus.cancelled)
+
+
 class Shipment(SQLModel, table=True):
     __tablename__ = "shipment"  # type:ignore
+    __table_args__ = (
+        # search, keyset pagination order and pg_trgm substring match
+        Index("ix_shipment_created_at", "created_at", "id"),
+        # partner work queue, grouped by destination
+        Index(
+            "ix_shipment_delivery_partner_queue",
+            "delivery_partner_id",
+            "destination",
+            "created_at",
+            "id",
+        ),
+        # overdue scan, only shipments still open are indexed
+        Index(
+            "ix_shipment_open_estimated_delivery",
+            "estimated_delivery",
+            postgresql_where=text("closed_at IS NULL"),
+        ),
+        # archive batches, only closed shipments are indexed
+        Index(
+            "ix_shipment_closed",
+            "closed_at",
+            "id",
+            postgresql_where=text("closed_at IS NOT NULL"),
+        ),
+        *(
+            Index(
+                f"ix_shipment_{column}_trgm",
+                column,
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+            )
+            for column in ("content", "client_contact_email", "client_contact_phone")
+        ),
+    )
 
     # auto generated id by uuid and Primary Key
-    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid4, primary_key=True))
+    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid7, primary_key=True))
     created_at: datetime = Field(
         sa_column=Column(
             postgresql.TIMESTAMP,
@@ -61,9 +101,15 @@ class Shipment(SQLModel, table=True):
     weight: float = Field(le=25)
     destination: int
     estimated_delivery: datetime
+    # set by the delivered or cancelled event
+    closed_at: datetime | None = Field(
+        default=None, sa_column=Column(postgresql.TIMESTAMP, nullable=True)
+    )
 
+    # oldest first, sorted by the database
     timeline: list["ShipmentEvent"] = Relationship(
-        back_populates="shipment", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="shipment",
+        sa_relationship_kwargs={"lazy": "selectin", "order_by": "ShipmentEvent.created_at"},
     )
 
     @property
@@ -71,7 +117,7 @@ class Shipment(SQLModel, table=True):
         return self.timeline[-1].status if len(self.timeline) > 0 else None
 
     # Seller
-    seller_id: UUID = Field(foreign_key="seller.id")
+    seller_id: UUID = Field(foreign_key="seller.id", index=True)
     seller: "Seller" = Relationship(
         back_populates="shipments", sa_relationship_kwargs={"lazy": "selectin"}
     )
@@ -97,12 +143,18 @@ class Shipment(SQLModel, table=True):
 
 class ShipmentEvent(SQLModel, table=True):
     __tablename__ = "shipment_event"  # type:ignore
+    __table_args__ = (
+        # timeline lookup, ordered by time
+        Index("ix_shipment_event_shipment_id", "shipment_id", "created_at"),
+    )
 
-    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid4, primary_key=True))
+    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid7, primary_key=True))
+    # partition key, range partitioned by month
     created_at: datetime = Field(
         sa_column=Column(
             postgresql.TIMESTAMP,
             default=datetime.now,
+            nullable=False,
         )
     )
 
@@ -118,7 +170,7 @@ class ShipmentEvent(SQLModel, table=True):
 
 class User(SQLModel):
     name: str
-    email: EmailStr
+    email: EmailStr = Field(unique=True, index=True)
     email_verified: bool = Field(default=False)
     password: str = Field(exclude=True)
 
@@ -126,7 +178,7 @@ class User(SQLModel):
 class Seller(User, table=True):
     __tablename__ = "seller"  # type:ignore
 
-    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid4, primary_key=True))
+    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid7, primary_key=True))
     created_at: datetime = Field(
         sa_column=Column(
             postgresql.TIMESTAMP,
@@ -145,7 +197,7 @@ class Seller(User, table=True):
 class DeliveryPartner(User, table=True):
     __tablename__ = "delivery_partner"  # type:ignore
 
-    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid4, primary_key=True))
+    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid7, primary_key=True))
     created_at: datetime = Field(
         sa_column=Column(
             postgresql.TIMESTAMP,
@@ -166,8 +218,7 @@ class DeliveryPartner(User, table=True):
         return [
             shipment
             for shipment in self.shipments
-            if shipment.status != ShipmentStatus.delivered
-            or shipment.status != ShipmentStatus.cancelled
+            if shipment.status not in CLOSED_STATUSES
         ]
 
     @property
@@ -178,7 +229,7 @@ class DeliveryPartner(User, table=True):
 class Review(SQLModel, table=True):
     __tablename__ = "review"  # type:ignore
 
-    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid4, primary_key=True))
+    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid7, primary_key=True))
     created_at: datetime = Field(
         sa_column=Column(
             postgresql.TIMESTAMP,
@@ -189,7 +240,7 @@ class Review(SQLModel, table=True):
     rating: int = Field(ge=1, le=5)
     comment: str | None = Field(default=None)
 
-    shipment_id: UUID = Field(foreign_key="shipment.id")
+    shipment_id: UUID = Field(foreign_key="shipment.id", unique=True, index=True)
     shipment: Shipment = Relationship(
         back_populates="review", sa_relationship_kwargs={"lazy": "selectin"}
     )
@@ -198,7 +249,7 @@ class Review(SQLModel, table=True):
 class Tag(SQLModel, table=True):
     __tablename__ = "tag"  # type:ignore
 
-    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid4, primary_key=True))
+    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid7, primary_key=True))
     created_at: datetime = Field(
         sa_column=Column(
             postgresql.TIMESTAMP,
@@ -206,7 +257,7 @@ class Tag(SQLModel, table=True):
         )
     )
 
-    name: TagName
+    name: TagName = Field(unique=True, index=True)
     instruction: str
 
     shipments: list[Shipment] = Relationship(
@@ -214,3 +265,66 @@ class Tag(SQLModel, table=True):
         link_model=ShipmentTag,
         sa_relationship_kwargs={"lazy": "immediate"},
     )
+
+
+class Outbox(SQLModel, table=True):
+    __tablename__ = "outbox"  # type:ignore
+
+    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid7, primary_key=True))
+    created_at: datetime = Field(
+        sa_column=Column(
+            postgresql.TIMESTAMP,
+            default=datetime.now,
+            index=True,
+        )
+    )
+
+    # celery task name and its keyword arguments
+    task: str
+    payload: dict = Field(sa_column=Column(postgresql.JSONB, nullable=False))
+    # overrides the queue the task is routed to
+    queue: str | None = Field(default=None)
+
+
+# transit time statistics per lane, sufficient statistics of the log duration
+# so batches can be merged by addition
+class TransitStat(SQLModel, table=True):
+    __tablename__ = "transit_stat"  # type:ignore
+
+    origin_zip: int = Field(primary_key=True)
+    destination: int = Field(primary_key=True)
+    delivery_partner_id: UUID = Field(primary_key=True)
+
+    samples: int
+    log_sum: float
+    log_square_sum: float
+    updated_at: datetime = Field(
+        sa_column=Column(postgresql.TIMESTAMP, default=datetime.now, nullable=False)
+    )
+
+
+# progress of incremental jobs
+class JobWatermark(SQLModel, table=True):
+    __tablename__ = "job_watermark"  # type:ignore
+
+    name: str = Field(primary_key=True)
+    value: datetime = Field(sa_column=Column(postgresql.TIMESTAMP, nullable=False))
+
+
+# seller endpoint receiving signed shipment event batches
+class Webhook(SQLModel, table=True):
+    __tablename__ = "webhook"  # type:ignore
+
+    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid7, primary_key=True))
+    created_at: datetime = Field(
+        sa_column=Column(
+            postgresql.TIMESTAMP,
+            default=datetime.now,
+        )
+    )
+
+    url: str
+    # shared with the seller once, signs every delivery
+    secret: str = Field(exclude=True)
+
+    seller_id: UUID = Field(foreign_key="seller.id", index=True)
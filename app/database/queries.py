@@ -0,0 +1,62 @@
+from typing import Sequence
+from uuid import UUID
+
+from sqlalchemy import ScalarSelect, Select, any_, bindparam
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload, raiseload
+from sqlmodel import col, select
+
+from app.database.models import Shipment, ShipmentEvent
+
+
+# `= ANY(:ids)`, one bind parameter for any number of ids so the statement stays cacheable
+def ids_param():
+    return any_(bindparam("ids", type_=postgresql.ARRAY(postgresql.UUID)))
+
+
+def shipment_list_options() -> tuple:
+    """list responses load the timeline, tags are attached by the request loaders"""
+    return (
+        raiseload(Shipment.seller),  # type:ignore
+        raiseload(Shipment.delivery_partner),  # type:ignore
+        raiseload(Shipment.review),  # type:ignore
+        noload(Shipment.tags),  # type:ignore
+    )
+
+
+def latest_status() -> ScalarSelect:
+    """status of the latest event of the enclosing shipment row, for filters"""
+    # one backward step on ix_shipment_event_shipment_id per shipment
+    return (
+        select(ShipmentEvent.status)
+        .where(ShipmentEvent.shipment_id == Shipment.id)
+        .order_by(col(ShipmentEvent.created_at).desc())
+        .limit(1)
+        .correlate(Shipment)
+        .scalar_subquery()
+    )
+
+
+def latest_events_query() -> Select:
+    """latest event per shipment of the `ids` parameter"""
+    return (
+        select(ShipmentEvent)
+        .where(col(ShipmentEvent.shipment_id) == ids_param())
+        .distinct(col(ShipmentEvent.shipment_id))
+        .order_by(col(ShipmentEvent.shipment_id), col(ShipmentEvent.created_at).desc())
+        .options(raiseload("*"))
+    )
+
+
+async def latest_events(
+    session: AsyncSession, shipment_ids: Sequence[UUID]
+) -> dict[UUID, ShipmentEvent]:
+    """latest event of every shipment in one query, without loading timelines"""
+    if not shipment_ids:
+        return {}
+
+    events = await session.scalars(
+        latest_events_query(), {"ids": list(shipment_ids)}
+    )
+    return {event.shipment_id: event for event in events}
@@ -1,29 +1,203 @@
+import time
+from functools import cache
 from uuid import UUID
 from redis.asyncio import Redis
-from app.config import db_settings
+from redis.asyncio.client import PubSub
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
+from app.config import db_settings, resilience_settings
+from app.core.exception import DependencyUnavailable
+from app.core.resilience import CircuitBreaker
+from app.utils import ACCESS_TOKEN_EXPIRY
 
 
-_token_blacklist = Redis(
-    host=db_settings.REDIS_HOST,
-    port=db_settings.REDIS_PORT,
-    db=0,
-)
+# clients are created on first use, not at import time
+@cache
+def _token_blacklist() -> Redis:
+    return Redis(
+        host=db_settings.REDIS_HOST,
+        port=db_settings.REDIS_PORT,
+        socket_connect_timeout=resilience_settings.REDIS_CONNECT_TIMEOUT,
+        db=0,
+    )
+
+@cache
+def _shipment_verification_code() -> Redis:
+    return Redis(
+        host=db_settings.REDIS_HOST,
+        port=db_settings.REDIS_PORT,
+        socket_connect_timeout=resilience_settings.REDIS_CONNECT_TIMEOUT,
+        db=1,
+        decode_responses=True
+    )
+
+@cache
+def _rate_limit() -> Redis:
+    return Redis(
+        host=db_settings.REDIS_HOST,
+        port=db_settings.REDIS_PORT,
+        socket_connect_timeout=resilience_settings.REDIS_CONNECT_TIMEOUT,
+        db=2,
+    )
+
+@cache
+def _idempotency() -> Redis:
+    return Redis(
+        host=db_settings.REDIS_HOST,
+        port=db_settings.REDIS_PORT,
+        socket_connect_timeout=resilience_settings.REDIS_CONNECT_TIMEOUT,
+        db=3,
+    )
+
+# pub/sub is not scoped to a db, this is just a dedicated connection pool
+@cache
+def _shipment_event_stream() -> Redis:
+    return Redis(
+        host=db_settings.REDIS_HOST,
+        port=db_settings.REDIS_PORT,
+        socket_connect_timeout=resilience_settings.REDIS_CONNECT_TIMEOUT,
+        decode_responses=True,
+    )
+
+SHIPMENT_EVENT_CHANNEL = "shipment:events:"
+
+# token bucket, refilled by elapsed redis server time so all api nodes agree
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+@cache
+def _take_token() -> AsyncScript:
+    return _rate_limit().register_script(_TOKEN_BUCKET_SCRIPT)
+
+# delete the lock only if it is still held by the same owner
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+@cache
+def _release_lock() -> AsyncScript:
+    return _idempotency().register_script(_RELEASE_LOCK_SCRIPT)
 
-_shipment_verification_code = Redis(
-    host=db_settings.REDIS_HOST,
-    port=db_settings.REDIS_PORT,
-    db=1,
-    decode_responses=True
+# request path calls, a redis outage fails them fast instead of hanging requests
+redis_breaker = CircuitBreaker(
+    "redis",
+    timeout=resilience_settings.REDIS_TIMEOUT,
+    errors=(RedisError, OSError),
 )
 
+# jti -> expiry of tokens logged out through or found by this process,
+# answers blacklist checks while redis is unavailable
+_recent_blacklist: dict[str, float] = {}
+_BLACKLIST_CACHE_TTL = ACCESS_TOKEN_EXPIRY.total_seconds()
+
+def _remember_blacklisted(jti: str):
+    if len(_recent_blacklist) >= resilience_settings.BLACKLIST_CACHE_SIZE:
+        # insertion ordered, drop the oldest
+        _recent_blacklist.pop(next(iter(_recent_blacklist)))
+    _recent_blacklist[jti] = time.monotonic() + _BLACKLIST_CACHE_TTL
+
+def _locally_blacklisted(jti: str) -> bool:
+    expiry = _recent_blacklist.get(jti)
+    return expiry is not None and expiry > time.monotonic()
+
 async def add_jti_to_blacklist(jti:str):
-    await _token_blacklist.set(jti, "blacklisted")
+    _remember_blacklisted(jti)
+    await redis_breaker.call(lambda: _token_blacklist().set(jti, "blacklisted"))
 
 async def is_jti_blacklisted(jti:str) -> bool:
-    return await _token_blacklist.exists(jti)
+    if _locally_blacklisted(jti):
+        return True
+
+    try:
+        blacklisted = bool(
+            await redis_breaker.call(lambda: _token_blacklist().exists(jti))
+        )
+    except DependencyUnavailable:
+        if resilience_settings.BLACKLIST_FAIL_OPEN:
+            return False
+        raise
+
+    if blacklisted:
+        _remember_blacklisted(jti)
+    return blacklisted
 
 async def add_shipment_verification_code(id:UUID, code:int):
-    await _shipment_verification_code.set(str(id), code)
+    await redis_breaker.call(lambda: _shipment_verification_code().set(str(id), code))
 
 async def get_shipment_verification_code(id:UUID) -> str:
-    return str(await _shipment_verification_code.get(str(id)))
\ No newline at end of file
+    return str(
+        await redis_breaker.call(lambda: _shipment_verification_code().get(str(id)))
+    )
+
+# take one token from the bucket, return seconds to wait (0 when allowed)
+async def take_rate_limit_token(key: str, rate: float, burst: int) -> float:
+    return float(
+        await redis_breaker.call(
+            lambda: _take_token()(keys=[f"rate:{key}"], args=[rate, burst])
+        )
+    )
+
+async def publish_shipment_event(id: UUID, message: str):
+    await redis_breaker.call(
+        lambda: _shipment_event_stream().publish(f"{SHIPMENT_EVENT_CHANNEL}{id}", message)
+    )
+
+# long lived subscription, not guarded, the broadcaster reconnects on errors
+def shipment_event_pubsub() -> PubSub:
+    return _shipment_event_stream().pubsub(ignore_subscribe_messages=True)
+
+async def get_idempotent_response(key: str) -> bytes | None:
+    return await redis_breaker.call(lambda: _idempotency().get(f"response:{key}"))
+
+async def save_idempotent_response(key: str, response: bytes, ttl: int):
+    await redis_breaker.call(
+        lambda: _idempotency().set(f"response:{key}", response, ex=ttl)
+    )
+
+async def acquire_idempotency_lock(key: str, owner: str, ttl: int) -> bool:
+    return bool(
+        await redis_breaker.call(
+            lambda: _idempotency().set(f"lock:{key}", owner, nx=True, ex=ttl)
+        )
+    )
+
+async def release_idempotency_lock(key: str, owner: str):
+    await redis_breaker.call(lambda: _release_lock()(keys=[f"lock:{key}"], args=[owner]))
+
+# close every client created by this worker
+async def close_redis():
+    for client in (
+        _token_blacklist,
+        _shipment_verification_code,
+        _rate_limit,
+        _idempotency,
+        _shipment_event_stream,
+    ):
+        if client.cache_info().currsize:
+            await client().aclose()
+        client.cache_clear()
+    _take_token.cache_clear()
+    _release_lock.cache_clear()
@@ -1,29 +1,62 @@
 from typing import Annotated
 from fastapi import Depends
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel
 from app.config import db_settings
 
-engine = create_async_engine(
-    url=db_settings.get_connection_string, 
-    echo=True
-)
+# created per worker process by the lifespan, never shared across a fork
+_engine: AsyncEngine | None = None
+_async_session: sessionmaker | None = None
+
+
+def init_engine() -> AsyncEngine:
+    global _engine, _async_session
+
+    if _engine is None:
+        _engine = create_async_engine(
+            url=db_settings.get_connection_string,
+            # no echo, it writes to stdout itself, LOG_SQL routes statements through the log queue
+            pool_size=db_settings.POSTGRES_POOL_SIZE,
+            max_overflow=db_settings.POSTGRES_MAX_OVERFLOW,
+            pool_recycle=db_settings.POSTGRES_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+        _async_session = sessionmaker(
+            bind=_engine, # type:ignore
+            class_=AsyncSession,
+            expire_on_commit=False
+        )
+    return _engine
+
+
+# scripts without a lifespan get the engine on first use
+def get_engine() -> AsyncEngine:
+    return init_engine()
+
+
+async def dispose_engine():
+    global _engine, _async_session
+
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _async_session = None
+
 
 # generate table data / auto migration
 async def create_db_tables():
-    async with engine.begin() as conn:
+    async with get_engine().begin() as conn:
         from app.database.models import Shipment
+        # the search indexes use gin_trgm_ops
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(SQLModel.metadata.create_all)
 
 
 # create async session
 async def get_session():
-    async_session = sessionmaker(
-        bind=engine, # type:ignore
-        class_=AsyncSession,
-        expire_on_commit=False
-    )
+    init_engine()
 
-    async with async_session() as session: # type:ignore
+    async with _async_session() as session: # type:ignore
         yield session
@@ -1,7 +1,12 @@
-from typing import Generic, Optional, TypeVar
+import base64
+import binascii
+import json
+from typing import Any, Generic, Optional, TypeVar
 
 from pydantic import BaseModel
 
+from app.core.exception import BadRequest
+
 
 T = TypeVar("T")
 
@@ -11,12 +16,30 @@ class Pagination(BaseModel):
     size: int
     total_data:int
 
+# keyset pagination, pass next_cursor back to get the next page
+class CursorPagination(BaseModel):
+    size: int
+    next_cursor: Optional[str] = None
+
+# opaque keyset cursor, the sort key values of the last row of a page
+def encode_cursor(*values: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor))
+    except (binascii.Error, ValueError):
+        raise BadRequest()
+    if not isinstance(values, list) or len(values) != size:
+        raise BadRequest()
+    return values
+
 class ApiResponse(BaseModel, Generic[T]):
     status_code:int
     message:str
     data:T
-    pagination: Optional[Pagination] = None
+    pagination: Optional[Pagination | CursorPagination] = None
 
     @staticmethod
-    def success(message:str,data: T, pagination:Optional[Pagination] = None):
+    def success(message:str,data: T, pagination:Optional[Pagination | CursorPagination] = None):
         return ApiResponse(status_code=200, message=message, data=data, pagination=pagination)
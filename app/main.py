@@ -1,18 +1,59 @@
+import asyncio
 from typing import cast
 from fastapi import FastAPI
 from scalar_fastapi import get_scalar_api_reference
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
+from app.core.broadcast import broadcaster
 from app.core.exception import add_exception_handlers
+from app.core.logging import start_logging, stop_logging
+from app.core.templating import precompile_templates
 from app.core.middleware import set_middlware
-from app.database.session import create_db_tables
+from app.database.redis import close_redis
+from app.database.session import create_db_tables, dispose_engine, init_engine
 from app.api.router import master_router
+from app.service.eta import eta_estimator
+from app.worker.dispatch import dispatcher
+from app.worker.outbox import OutboxRelay
 
 @asynccontextmanager
 async def lifespan_handler(app:FastAPI):
+    # json logs written by a background thread
+    start_logging()
+
+    # pools are created per worker process, after the server forked
+    init_engine()
+
     # await create_db_tables() # non-active it because it can run schema db
+
+    # pages and mails render from the in memory cache from the first request
+    precompile_templates()
+
+    # celery producer thread
+    dispatcher.start()
+
+    # publish queued notifications to celery
+    outbox_relay = asyncio.create_task(OutboxRelay().run())
+
+    # one redis subscription shared by all live tracking streams
+    await broadcaster.start()
+
+    # transit time lookup used for shipment eta
+    eta_reload = asyncio.create_task(eta_estimator.run())
+
     yield
 
+    # graceful shutdown, stop producers first then close the pools they use
+    await broadcaster.stop()
+    for task in (eta_reload, outbox_relay):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await asyncio.to_thread(dispatcher.stop)
+    await close_redis()
+    await dispose_engine()
+    stop_logging()
+
 app = FastAPI(lifespan=lifespan_handler)
 
 # include router
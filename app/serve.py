@@ -0,0 +1,64 @@
+"""Production server
+
+    python -m app.serve
+
+Server, worker count, keep-alive, backlog and graceful shutdown are read from
+`AppSettings`. Every worker builds its own database and redis pools in the
+lifespan, nothing is created before the fork.
+"""
+import os
+
+from app.config import app_settings
+
+
+def _workers() -> int:
+    return app_settings.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def run_uvicorn():
+    import uvicorn
+
+    uvicorn.run(
+        "app.main:app",
+        host=app_settings.SERVER_HOST,
+        port=app_settings.SERVER_PORT,
+        workers=_workers(),
+        backlog=app_settings.SERVER_BACKLOG,
+        timeout_keep_alive=app_settings.SERVER_KEEP_ALIVE,
+        timeout_graceful_shutdown=app_settings.SERVER_GRACEFUL_TIMEOUT,
+        proxy_headers=True,
+        # written by the app as json, with the request id
+        access_log=False,
+    )
+
+
+def run_gunicorn():
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in {
+                "bind": f"{app_settings.SERVER_HOST}:{app_settings.SERVER_PORT}",
+                "workers": _workers(),
+                "worker_class": "uvicorn.workers.UvicornWorker",
+                "keepalive": app_settings.SERVER_KEEP_ALIVE,
+                "backlog": app_settings.SERVER_BACKLOG,
+                "graceful_timeout": app_settings.SERVER_GRACEFUL_TIMEOUT,
+                # the app is imported in each worker, pools are never inherited
+                "preload_app": False,
+            }.items():
+                self.cfg.set(key, value)  # type:ignore
+
+        def load(self):
+            from app.main import app
+
+            return app
+
+    Application().run()
+
+
+if __name__ == "__main__":
+    if app_settings.SERVER == "gunicorn":
+        run_gunicorn()
+    else:
+        run_uvicorn()
@@ -0,0 +1,181 @@
+import heapq
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Protocol
+from uuid import UUID
+
+
+@dataclass
+class PartnerSlot:
+    id: UUID
+    name: str
+    capacity: int
+    load: int = 0
+
+    # bumped on every change, invalidates heap entries pushed before it
+    version: int = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.capacity - self.load
+
+    @property
+    def utilization(self) -> float:
+        return self.load / self.capacity if self.capacity > 0 else float("inf")
+
+
+@dataclass
+class Zone:
+    """Partners serving one zip code, heap ordered by utilization"""
+
+    partners: list[PartnerSlot]
+    loaded_at: float = field(default_factory=time.monotonic)
+    cursor: int = 0
+    heap: list[tuple[float, int, int, UUID]] = field(init=False)
+
+    def __post_init__(self):
+        self.ids = {slot.id for slot in self.partners}
+        self.heap = [self._entry(slot) for slot in self.partners]
+        heapq.heapify(self.heap)
+
+    @staticmethod
+    def _entry(slot: PartnerSlot) -> tuple[float, int, int, UUID]:
+        return (slot.utilization, -slot.remaining, slot.version, slot.id)
+
+    def push(self, slot: PartnerSlot):
+        heapq.heappush(self.heap, self._entry(slot))
+
+        # compact once stale entries dominate the heap
+        if len(self.heap) > 4 * len(self.partners) + 16:
+            self.heap = [self._entry(slot) for slot in self.partners]
+            heapq.heapify(self.heap)
+
+    def least_loaded(self, slots: dict[UUID, PartnerSlot]) -> PartnerSlot | None:
+        while self.heap:
+            _, _, version, id = self.heap[0]
+            slot = slots.get(id)
+            if slot is None or id not in self.ids or slot.version != version:
+                # outdated entry, the current one was pushed on change
+                heapq.heappop(self.heap)
+            else:
+                return slot if slot.remaining > 0 else None
+        return None
+
+
+class AssignmentStrategy(Protocol):
+    def choose(self, zone: Zone, slots: dict[UUID, PartnerSlot]) -> PartnerSlot | None: ...
+
+
+class LeastLoadedStrategy:
+    """Partner with the lowest load relative to its capacity"""
+
+    def choose(self, zone: Zone, slots: dict[UUID, PartnerSlot]) -> PartnerSlot | None:
+        return zone.least_loaded(slots)
+
+
+class WeightedCapacityStrategy:
+    """Random partner, weighted by remaining capacity"""
+
+    def __init__(self, rng: random.Random | None = None):
+        self.rng = rng or random.Random()
+
+    def choose(self, zone: Zone, slots: dict[UUID, PartnerSlot]) -> PartnerSlot | None:
+        available = [slot for slot in zone.partners if slot.remaining > 0]
+        if not available:
+            return None
+        return self.rng.choices(
+            available, weights=[slot.remaining for slot in available]
+        )[0]
+
+
+class RoundRobinStrategy:
+    """Next partner with capacity left, cursor kept per zip code"""
+
+    def choose(self, zone: Zone, slots: dict[UUID, PartnerSlot]) -> PartnerSlot | None:
+        size = len(zone.partners)
+        for step in range(size):
+            slot = zone.partners[(zone.cursor + step) % size]
+            if slot.remaining > 0:
+                zone.cursor = (zone.cursor + step + 1) % size
+                return slot
+        return None
+
+
+STRATEGIES: dict[str, type[AssignmentStrategy]] = {
+    "least_loaded": LeastLoadedStrategy,
+    "weighted": WeightedCapacityStrategy,
+    "round_robin": RoundRobinStrategy,
+}
+
+
+class CapacityIndex:
+    """In memory partner capacity per zip code
+
+    Zones are loaded from the database on first use and reloaded after `ttl`
+    seconds, in between loads are kept current by `assign` and `release`.
+    """
+
+    def __init__(self, strategy: AssignmentStrategy, ttl: float = 30.0):
+        self.strategy = strategy
+        self.ttl = ttl
+        self.slots: dict[UUID, PartnerSlot] = {}
+        self.zones: dict[int, Zone] = {}
+        self.partner_zones: dict[UUID, set[int]] = {}
+
+    def is_fresh(self, zipcode: int) -> bool:
+        zone = self.zones.get(zipcode)
+        return zone is not None and time.monotonic() - zone.loaded_at < self.ttl
+
+    def load_zone(self, zipcode: int, partners: Iterable[PartnerSlot]):
+        slots = []
+        changed = []
+        for partner in partners:
+            slot = self.slots.get(partner.id)
+            if slot is None:
+                slot = self.slots[partner.id] = partner
+            elif (slot.capacity, slot.load) != (partner.capacity, partner.load):
+                slot.name = partner.name
+                slot.capacity = partner.capacity
+                slot.load = partner.load
+                changed.append(slot)
+            slots.append(slot)
+            self.partner_zones.setdefault(slot.id, set()).add(zipcode)
+
+        self.zones[zipcode] = Zone(partners=slots)
+        for slot in changed:
+            self._change(slot, 0)
+
+    def assign(self, zipcode: int) -> PartnerSlot | None:
+        zone = self.zones.get(zipcode)
+        if zone is None:
+            return None
+
+        slot = self.strategy.choose(zone, self.slots)
+        if slot is not None:
+            self._change(slot, 1)
+        return slot
+
+    def release(self, partner_id: UUID):
+        slot = self.slots.get(partner_id)
+        if slot is not None and slot.load > 0:
+            self._change(slot, -1)
+
+    def mark_full(self, partner_id: UUID):
+        slot = self.slots.get(partner_id)
+        if slot is not None:
+            self._change(slot, slot.remaining)
+
+    def invalidate(self):
+        self.zones.clear()
+        self.partner_zones.clear()
+
+    def _change(self, slot: PartnerSlot, delta: int):
+        slot.load += delta
+        slot.version += 1
+
+        # every zone the partner serves gets an entry with the new load
+        for zipcode in self.partner_zones.get(slot.id, ()):
+            zone = self.zones.get(zipcode)
+            if zone is not None:
+                zone.push(slot)
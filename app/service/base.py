@@ -1,4 +1,5 @@
-from typing import Generic, TypeVar
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Generic, TypeVar
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import SQLModel
@@ -10,6 +11,38 @@ class BaseService(Generic[ModelT]):
         self.session = session
         self.model = model
 
+    @asynccontextmanager
+    async def unit_of_work(self):
+        """commit everything staged inside once, nested blocks join the outer one"""
+        # services of one request share the session, the state lives on it
+        if "after_commit" in self.session.info:
+            yield
+            return
+
+        self.session.info["after_commit"] = []
+        try:
+            yield
+            await self.session.commit()
+            callbacks = self.session.info["after_commit"]
+        except BaseException:
+            await self.session.rollback()
+            raise
+        finally:
+            del self.session.info["after_commit"]
+
+        for callback in callbacks:
+            await callback()
+
+    def _after_commit(self, callback: Callable[[], Awaitable[None]]):
+        # side effects that must not be seen before the data is committed
+        self.session.info["after_commit"].append(callback)
+
+    async def _stage(self, *entities: SQLModel):
+        # flushed, not committed: ids are set and server defaults come back
+        # through INSERT ... RETURNING instead of a refresh
+        self.session.add_all(entities)
+        await self.session.flush()
+
     async def _get(self, id: UUID) -> ModelT | None:
         return await self.session.get(self.model, id)
 
@@ -1,14 +1,89 @@
+from datetime import datetime
 from typing import Sequence
+from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlmodel import select, any_
-from app.core.exception import DeliveryPartnerNotAvailable
+from sqlalchemy import Select, func, tuple_
+from sqlmodel import col, select, any_
+from app.config import assignment_settings
+from app.core.exception import BadRequest, DeliveryPartnerNotAvailable
+from app.core.principal import principal_cache
+from app.service.assignment import STRATEGIES, CapacityIndex, PartnerSlot
+from app.database.loader import loaders
+from app.database.queries import latest_status, shipment_list_options
+from app.helper.api import decode_cursor, encode_cursor
 from app.service.user import UserService
-from app.database.models import DeliveryPartner, Shipment
+from app.database.models import (
+    CLOSED_STATUSES,
+    DeliveryPartner,
+    Shipment,
+    ShipmentStatus,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.schemas.delivery_partner import DeliveryPartnerCreate
 from fastapi import BackgroundTasks
 
+# partner capacity per zip code, shared by all requests of this worker
+capacity_index = CapacityIndex(
+    strategy=STRATEGIES[assignment_settings.ASSIGNMENT_STRATEGY](),
+    ttl=assignment_settings.ASSIGNMENT_INDEX_TTL,
+)
+
+
+def work_queue_query(
+    partner_id: UUID, status: ShipmentStatus | None, cursor: str | None, size: int
+) -> Select:
+    """open shipments of the partner from the cursor on, without loader options"""
+    query = select(Shipment).where(
+        Shipment.delivery_partner_id == partner_id,
+        col(Shipment.closed_at).is_(None),
+    )
+
+    if status:
+        query = query.where(latest_status() == status)
+
+    if cursor:
+        destination, created_at, id = decode_cursor(cursor, 3)
+        try:
+            position = (int(destination), datetime.fromisoformat(created_at), UUID(id))
+        except (AttributeError, TypeError, ValueError):
+            raise BadRequest()
+        query = query.where(
+            tuple_(Shipment.destination, Shipment.created_at, Shipment.id)
+            > tuple_(*position)
+        )
+
+    # same order as ix_shipment_delivery_partner_queue
+    return query.order_by(
+        col(Shipment.destination), col(Shipment.created_at), col(Shipment.id)
+    ).limit(size + 1)
+
+
+def partner_slots_query(zipcode: int | None, partner_id: UUID | None) -> Select:
+    """partners with their capacity and number of open shipments"""
+    active_count = (
+        select(func.count())
+        .select_from(Shipment)
+        # kept up to date by the shipment events, no event lookup per shipment
+        .where(
+            col(Shipment.delivery_partner_id) == DeliveryPartner.id,
+            col(Shipment.closed_at).is_(None),
+        )
+        .scalar_subquery()
+    )
+
+    query = select(
+        DeliveryPartner.id,
+        DeliveryPartner.name,
+        DeliveryPartner.max_handling_capacity,
+        active_count,
+    )
+    if zipcode is not None:
+        query = query.where(zipcode == any_(DeliveryPartner.serviceable_zip_codes))
+    if partner_id is not None:
+        query = query.where(DeliveryPartner.id == partner_id)
+    return query
+
 
 class DeliverPartnerService(UserService[DeliveryPartner]):
     def __init__(self, session: AsyncSession, tasks: BackgroundTasks):
@@ -26,7 +101,11 @@ class DeliverPartnerService(UserService[DeliveryPartner]):
         return await self._generate_token(email, password)
 
     async def update(self, partner: DeliveryPartner) -> DeliveryPartner:
-        return await self._update(partner)
+        partner = await self._update(partner)
+        # capacity or zip codes may have changed
+        capacity_index.invalidate()
+        principal_cache.invalidate(DeliveryPartner, partner.id)
+        return partner
 
     async def get_partner_by_zipcode(self, zipcode: int) -> Sequence[DeliveryPartner]:
         return (
@@ -37,11 +116,72 @@ class DeliverPartnerService(UserService[DeliveryPartner]):
             )
         ).all()
 
-    async def assign_shipment(self, shipment: Shipment) -> DeliveryPartner:
-        eligible_partners = await self.get_partner_by_zipcode(shipment.destination)
-        for partner in eligible_partners:
-            if partner.current_handling_capacity > 0:
-                partner.shipments.append(shipment)
-                return partner
+    async def assign_shipment(self, shipment: Shipment) -> PartnerSlot:
+        """partner with room for the shipment, call it inside the unit of work
+
+        The chosen partner's row stays locked until the transaction ends,
+        concurrent assignments to it, from any worker, wait and count again.
+        """
+        zipcode = shipment.destination
+        if not capacity_index.is_fresh(zipcode):
+            capacity_index.load_zone(zipcode, await self._get_partner_slots(zipcode=zipcode))
+
+        while (slot := capacity_index.assign(zipcode)) is not None:
+            # the index is per worker, confirm with the database before using it,
+            # counted after the lock so shipments committed meanwhile are seen
+            savepoint = await self.session.begin_nested()
+            await self.session.execute(
+                select(DeliveryPartner.id)
+                .where(DeliveryPartner.id == slot.id)
+                .with_for_update()
+            )
+            partner = await self._get_partner_slots(partner_id=slot.id)
+            if partner and partner[0].remaining > 0:
+                await savepoint.commit()
+                return slot
+
+            # full, the rollback releases its lock at once
+            await savepoint.rollback()
+            capacity_index.mark_full(slot.id)
 
         raise DeliveryPartnerNotAvailable()
+
+    def release_shipment(self, partner_id: UUID):
+        capacity_index.release(partner_id)
+
+    async def work_queue(
+        self,
+        partner_id: UUID,
+        status: ShipmentStatus | None = None,
+        cursor: str | None = None,
+        size: int = 50,
+    ) -> tuple[Sequence[Shipment], str | None]:
+        """active shipments of the partner ordered by destination, and the next cursor"""
+        if status in CLOSED_STATUSES:
+            raise BadRequest()
+
+        query = work_queue_query(partner_id, status, cursor, size).options(
+            *shipment_list_options()
+        )
+
+        shipments = (await self.session.scalars(query)).all()
+        if len(shipments) <= size:
+            await loaders(self.session).attach_tags(shipments)
+            return shipments, None
+
+        shipments = shipments[:size]
+        await loaders(self.session).attach_tags(shipments)
+        last = shipments[-1]
+        return shipments, encode_cursor(
+            last.destination, last.created_at.isoformat(), last.id
+        )
+
+    async def _get_partner_slots(
+        self, zipcode: int | None = None, partner_id: UUID | None = None
+    ) -> list[PartnerSlot]:
+        query = partner_slots_query(zipcode, partner_id)
+        rows = await self.session.execute(query)
+        return [
+            PartnerSlot(id=id, name=name, capacity=capacity, load=load)
+            for id, name, capacity, load in rows
+        ]
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from statistics import NormalDist
+from typing import Sequence
+from uuid import UUID
+
+from sqlalchemy import Row, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlmodel import select
+
+from app.config import eta_settings
+from app.database.models import JobWatermark, TransitStat
+from app.database.session import get_engine
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "transit_stat"
+
+# (origin zip, destination zip, partner), None is a wildcard used as fallback
+Lane = tuple[int | None, int, UUID | None]
+
+# placed -> delivered duration of every delivered shipment, in delivery order,
+# batches end on a whole timestamp so deliveries made at the same instant are
+# never split between the batch and the watermark
+_DELIVERIES = text("""
+    WITH cutoff AS (
+        SELECT max(created_at) AS created_at
+        FROM (
+            SELECT created_at
+            FROM shipment_event
+            WHERE status = 'delivered'
+              AND created_at > :since
+              AND created_at <= :until
+            ORDER BY created_at
+            LIMIT :limit
+        ) batch
+    )
+    SELECT event.created_at AS delivered_at,
+           extract(epoch FROM event.created_at - shipment.created_at) / 3600 AS hours,
+           coalesce(seller.zip_code, 0) AS origin_zip,
+           shipment.destination,
+           shipment.delivery_partner_id
+    FROM shipment_event event
+    JOIN shipment ON shipment.id = event.shipment_id
+    JOIN seller ON seller.id = shipment.seller_id
+    WHERE event.status = 'delivered'
+      AND event.created_at > :since
+      AND event.created_at <= (SELECT created_at FROM cutoff)
+    ORDER BY event.created_at
+""")
+
+
+@dataclass
+class TransitSummary:
+    samples: int = 0
+    log_sum: float = 0.0
+    log_square_sum: float = 0.0
+
+    def add(self, other: "TransitSummary"):
+        self.samples += other.samples
+        self.log_sum += other.log_sum
+        self.log_square_sum += other.log_square_sum
+
+    def quantile(self, z: float) -> timedelta:
+        # transit times are modelled as log normal
+        mean = self.log_sum / self.samples
+        variance = max(self.log_square_sum / self.samples - mean**2, 0.0)
+        return timedelta(hours=math.exp(mean + z * math.sqrt(variance)))
+
+
+async def fetch_deliveries(
+    conn: AsyncConnection, since: datetime, until: datetime, limit: int
+) -> Sequence[Row]:
+    result = await conn.execute(
+        _DELIVERIES, {"since": since, "until": until, "limit": limit}
+    )
+    return result.all()
+
+
+def aggregate(rows: Sequence[Row]) -> dict[Lane, TransitSummary]:
+    """sum the log durations of a batch of deliveries per lane"""
+    import numpy as np
+
+    hours = np.array([row.hours for row in rows], dtype=np.float64)
+    partners, partner_index = np.unique(
+        np.array([str(row.delivery_partner_id) for row in rows]), return_inverse=True
+    )
+    keys = np.column_stack(
+        [
+            np.array([row.origin_zip for row in rows], dtype=np.int64),
+            np.array([row.destination for row in rows], dtype=np.int64),
+            partner_index,
+        ]
+    )
+
+    # clock skew or manual edits, not a transit time
+    valid = hours > 0
+    keys, hours = keys[valid], hours[valid]
+    if not len(hours):
+        return {}
+
+    lanes, lane_index = np.unique(keys, axis=0, return_inverse=True)
+    lane_index = lane_index.reshape(-1)
+    logs = np.log(hours)
+    samples = np.bincount(lane_index, minlength=len(lanes))
+    log_sum = np.bincount(lane_index, weights=logs, minlength=len(lanes))
+    log_square_sum = np.bincount(lane_index, weights=logs**2, minlength=len(lanes))
+
+    return {
+        (int(origin), int(destination), UUID(partners[partner])): TransitSummary(
+            int(samples[i]), float(log_sum[i]), float(log_square_sum[i])
+        )
+        for i, (origin, destination, partner) in enumerate(lanes)
+    }
+
+
+async def refresh_transit_stats(
+    batch_size: int = eta_settings.ETA_REFRESH_BATCH_SIZE,
+) -> int:
+    """fold deliveries made since the last run into transit_stat"""
+    until = datetime.now() - timedelta(seconds=eta_settings.ETA_REFRESH_LAG)
+    total = 0
+
+    while True:
+        # stats and watermark are committed together, a batch is counted once
+        async with get_engine().begin() as conn:
+            await conn.execute(
+                insert(JobWatermark)
+                .values(name=WATERMARK, value=datetime.min)
+                .on_conflict_do_nothing()
+            )
+            # concurrent refreshes wait here instead of counting twice
+            since = await conn.scalar(
+                select(JobWatermark.value)
+                .where(JobWatermark.name == WATERMARK)
+                .with_for_update()
+            )
+
+            rows = await fetch_deliveries(conn, since, until, batch_size)  # type:ignore
+            if not rows:
+                return total
+
+            stats = aggregate(rows)
+            if stats:
+                statement = insert(TransitStat).values(
+                    [
+                        {
+                            "origin_zip": origin,
+                            "destination": destination,
+                            "delivery_partner_id": partner,
+                            "samples": stat.samples,
+                            "log_sum": stat.log_sum,
+                            "log_square_sum": stat.log_square_sum,
+                            "updated_at": datetime.now(),
+                        }
+                        for (origin, destination, partner), stat in stats.items()
+                    ]
+                )
+                await conn.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=["origin_zip", "destination", "delivery_partner_id"],
+                        set_={
+                            "samples": TransitStat.samples + statement.excluded.samples,
+                            "log_sum": TransitStat.log_sum + statement.excluded.log_sum,
+                            "log_square_sum": TransitStat.log_square_sum
+                            + statement.excluded.log_square_sum,
+                            "updated_at": statement.excluded.updated_at,
+                        },
+                    )
+                )
+
+            await conn.execute(
+                JobWatermark.__table__.update()  # type:ignore
+                .where(JobWatermark.name == WATERMARK)
+                .values(value=rows[-1].delivered_at)
+            )
+
+        total += len(rows)
+        # a batch can exceed batch_size when the last timestamp is shared
+        if len(rows) < batch_size:
+            return total
+
+
+class EtaEstimator:
+    """In memory transit time lookup, falls back to wider lanes when data is sparse"""
+
+    def __init__(
+        self,
+        quantile: float = eta_settings.ETA_QUANTILE,
+        min_samples: int = eta_settings.ETA_MIN_SAMPLES,
+        default: timedelta = timedelta(days=eta_settings.ETA_DEFAULT_DAYS),
+    ):
+        self.z = NormalDist().inv_cdf(quantile)
+        self.min_samples = min_samples
+        self.default = default
+        self._lanes: dict[Lane, TransitSummary] = {}
+
+    def load(self, stats: dict[Lane, TransitSummary]):
+        lanes: dict[Lane, TransitSummary] = {}
+        for (origin, destination, partner), stat in stats.items():
+            # any origin with this partner, then any origin and partner
+            for lane in (
+                (origin, destination, partner),
+                (None, destination, partner),
+                (None, destination, None),
+            ):
+                lanes.setdefault(lane, TransitSummary()).add(stat)
+        # swapped in one assignment, estimates never see a half built lookup
+        self._lanes = lanes
+
+    def estimate(
+        self, origin_zip: int | None, destination: int, partner_id: UUID
+    ) -> timedelta:
+        for lane in (
+            (origin_zip or 0, destination, partner_id),
+            (None, destination, partner_id),
+            (None, destination, None),
+        ):
+            stat = self._lanes.get(lane)
+            if stat is not None and stat.samples >= self.min_samples:
+                return stat.quantile(self.z)
+        return self.default
+
+    async def reload(self):
+        async with get_engine().connect() as conn:
+            rows = await conn.execute(select(TransitStat))
+            self.load(
+                {
+                    (row.origin_zip, row.destination, row.delivery_partner_id): TransitSummary(
+                        row.samples, row.log_sum, row.log_square_sum
+                    )
+                    for row in rows
+                }
+            )
+
+    async def run(self, interval: float = eta_settings.ETA_RELOAD_INTERVAL):
+        while True:
+            try:
+                await self.reload()
+            except Exception:
+                logger.exception("eta reload failed, keeping previous estimates")
+            await asyncio.sleep(interval)
+
+
+eta_estimator = EtaEstimator()
@@ -1,25 +1,13 @@
 from fastapi.background import BackgroundTasks
-from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
 from pydantic import EmailStr
-from twilio.rest import Client
 from app.config import notification_settings
-from app.utils import TEMPLATE_DIR
+from app.core.clients import get_fastmail, get_twilio_client
+from app.core.templating import render_template
 
 
 class NotificationService:
     def __init__(self, tasks: BackgroundTasks) -> None:
-        self.fastmail = FastMail(
-            ConnectionConfig(
-                **notification_settings.model_dump(
-                    exclude={"TWILIO_AUTH_TOKEN", "TWILIO_SID", "TWILIO_PHONE_NUMBER"}
-                ), TEMPLATE_FOLDER=TEMPLATE_DIR
-            )
-        )
         self.tasks = tasks
-        self.twilio_client = Client(
-            notification_settings.TWILIO_SID,
-            notification_settings.TWILIO_AUTH_TOKEN,
-        )
 
     async def send_email(
         self,
@@ -27,8 +15,10 @@ class NotificationService:
         subject: str,
         body: str,
     ):
+        from fastapi_mail import MessageSchema, MessageType
+
         self.tasks.add_task(
-            self.fastmail.send_message,
+            get_fastmail().send_message,
             message=MessageSchema(
                 recipients=recipients,
                 subject=subject,
@@ -44,19 +34,20 @@ class NotificationService:
         context: dict,
         template_name: str,
     ):
+        from fastapi_mail import MessageSchema, MessageType
+
         self.tasks.add_task(
-            self.fastmail.send_message,
+            get_fastmail().send_message,
             message=MessageSchema(
                 recipients=recipients,
                 subject=subject,
-                template_body=context,
+                body=await render_template(template_name, context),
                 subtype=MessageType.html,
             ),
-            template_name=template_name,
         )
 
     async def send_sms(self, to: str, body: str):
-        await self.twilio_client.messages.create_async(
+        await get_twilio_client().messages.create_async(
             body=body,
             from_=notification_settings.TWILIO_PHONE_NUMBER,
             to=to,
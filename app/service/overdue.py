@@ -0,0 +1,157 @@
+import logging
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import Select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, raiseload
+from sqlmodel import col, select
+
+from app.config import overdue_settings
+from app.database.models import JobWatermark, Outbox, Shipment, ShipmentEvent
+from app.database.queries import latest_events
+from app.database.session import get_engine
+from app.service.webhook import WebhookService
+from app.worker import names
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "overdue_shipment"
+
+
+def _open_due(since: datetime, until: datetime) -> tuple:
+    # served by ix_shipment_open_estimated_delivery, closed shipments aren't in it
+    return (
+        col(Shipment.closed_at).is_(None),
+        col(Shipment.estimated_delivery) > since,
+        col(Shipment.estimated_delivery) <= until,
+    )
+
+
+def due_query(since: datetime, until: datetime, batch_size: int) -> Select:
+    """estimated delivery of the next open shipments due after `since`"""
+    return (
+        select(Shipment.estimated_delivery)
+        .where(*_open_due(since, until))
+        .order_by(col(Shipment.estimated_delivery))
+        .limit(batch_size)
+    )
+
+
+async def _overdue_batch(
+    session: AsyncSession, since: datetime, until: datetime, batch_size: int
+) -> tuple[list[Shipment], datetime | None]:
+    """open shipments due after `since`, up to a whole estimated_delivery value"""
+    due = due_query(since, until, batch_size).subquery()
+    # shipments due at the same instant are never split between batches
+    cutoff = await session.scalar(select(func.max(due.c.estimated_delivery)))
+    if cutoff is None:
+        return [], None
+
+    shipments = await session.scalars(
+        select(Shipment)
+        .where(*_open_due(since, cutoff))
+        .options(
+            load_only(
+                Shipment.id,  # type:ignore
+                Shipment.seller_id,  # type:ignore
+                Shipment.client_contact_email,  # type:ignore
+                Shipment.estimated_delivery,  # type:ignore
+            ),
+            raiseload("*"),
+        )
+    )
+    return list(shipments), cutoff
+
+
+async def scan_overdue_shipments(
+    batch_size: int = overdue_settings.OVERDUE_BATCH_SIZE,
+) -> int:
+    """add an overdue event to shipments whose estimated delivery passed since the last run"""
+    until = datetime.now()
+    total = 0
+
+    while True:
+        # events, notifications and watermark are committed together
+        async with AsyncSession(get_engine(), expire_on_commit=False) as session:
+            async with session.begin():
+                await session.execute(
+                    insert(JobWatermark)
+                    .values(
+                        name=WATERMARK,
+                        value=until
+                        - timedelta(hours=overdue_settings.OVERDUE_LOOKBACK_HOURS),
+                    )
+                    .on_conflict_do_nothing()
+                )
+                # concurrent scans wait here instead of notifying twice
+                since = await session.scalar(
+                    select(JobWatermark.value)
+                    .where(JobWatermark.name == WATERMARK)
+                    .with_for_update()
+                )
+
+                shipments, cutoff = await _overdue_batch(
+                    session, since, until, batch_size  # type:ignore
+                )
+                if cutoff is None:
+                    return total
+
+                await _emit(session, shipments)
+
+                await session.execute(
+                    JobWatermark.__table__.update()  # type:ignore
+                    .where(JobWatermark.name == WATERMARK)
+                    .values(value=cutoff)
+                )
+
+        total += len(shipments)
+        logger.info("%d shipments overdue up to %s", len(shipments), cutoff)
+
+
+async def _emit(session: AsyncSession, shipments: list[Shipment]):
+    latest = await latest_events(session, [shipment.id for shipment in shipments])
+
+    events = []
+    for shipment in shipments:
+        last_event = latest.get(shipment.id)
+        if last_event is None:
+            continue
+
+        # same status and location, the timeline only records the delay
+        event = ShipmentEvent(
+            location=last_event.location,
+            status=last_event.status,
+            description=(
+                f"delivery overdue, expected by {shipment.estimated_delivery:%Y-%m-%d %H:%M}"
+            ),
+            shipment_id=shipment.id,
+        )
+        events.append((shipment, event))
+        session.add(event)
+        session.add(
+            Outbox(
+                task=names.SEND_MAIL,
+                # bulk, must not delay verification codes
+                queue=names.BULK_QUEUE,
+                payload=jsonable_encoder(
+                    {
+                        "recipients": [shipment.client_contact_email],
+                        "subject": "Your Order is Delayed ⏳",
+                        "body": (
+                            f"Your order {shipment.id} was expected by "
+                            f"{shipment.estimated_delivery:%Y-%m-%d %H:%M} and is still on its way. "
+                            "We are sorry for the delay."
+                        ),
+                    }
+                ),
+            )
+        )
+
+    # one insert for the batch, ids and timestamps are needed by the webhook payloads
+    await session.flush()
+
+    webhook_service = WebhookService(session)
+    for shipment, event in events:
+        await webhook_service.enqueue(shipment.seller_id, event)
@@ -1,27 +1,110 @@
 from typing import Sequence
 from uuid import UUID
+from sqlalchemy import Select, and_, exists, inspect, or_, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
+from sqlalchemy.orm import load_only, noload
+from sqlmodel import col, select
 from app.api.schemas.shipment import (
+    SHIPMENT_COLUMNS,
     ShipmentCreate,
+    ShipmentFields,
     ShipmentReview,
+    ShipmentSearch,
     ShipmentUpdate,
     ShipmentUpdatePartial,
 )
 from app.core.exception import BadRequest, ClientNotAuthorized, EntityNotFound, InvalidToken
-from app.database.models import DeliveryPartner, Review, Seller, Shipment, TagName
+from app.core.principal import Principal
+from app.database.models import Review, Shipment, ShipmentTag, Tag, TagName
+from app.database.loader import loaders
+from app.database.queries import latest_status, shipment_list_options
 from app.database.models import ShipmentStatus
 from datetime import datetime, timedelta
 from fastapi import HTTPException, status
 
 from app.database.redis import get_shipment_verification_code
+from app.helper.api import decode_cursor, encode_cursor
 from app.helper.datetimeconversion import to_naive_utc
 from app.service.base import BaseService
-from app.service.delivery_partner import DeliverPartnerService
+from app.service.delivery_partner import CLOSED_STATUSES, DeliverPartnerService
+from app.service.eta import eta_estimator
 from app.service.shipment_event import ShipmentEventService
 from app.utils import decode_url_safe_token
 
 
+def _escape_like(value: str) -> str:
+    # wildcards in the search text are matched literally, "%%%" would match every row
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_query(search: ShipmentSearch, seller_id: UUID | None) -> Select:
+    """filters, keyset position and order of a search page, without loader options"""
+    query = select(Shipment)
+
+    if seller_id:
+        # client contacts are matched, a seller never sees other sellers' shipments
+        query = query.where(Shipment.seller_id == seller_id)
+
+    if search.seller_id:
+        query = query.where(Shipment.seller_id == search.seller_id)
+
+    if search.q:
+        # served by the pg_trgm gin indexes, one bitmap scan per column
+        pattern = f"%{_escape_like(search.q)}%"
+        query = query.where(
+            or_(
+                col(Shipment.content).ilike(pattern, escape="\\"),
+                col(Shipment.client_contact_email).ilike(pattern, escape="\\"),
+                col(Shipment.client_contact_phone).ilike(pattern, escape="\\"),
+            )
+        )
+
+    if search.partner_id:
+        query = query.where(Shipment.delivery_partner_id == search.partner_id)
+
+    if search.destination is not None:
+        query = query.where(Shipment.destination == search.destination)
+
+    if search.tag:
+        query = query.where(
+            exists().where(
+                and_(
+                    ShipmentTag.shipment_id == Shipment.id,
+                    ShipmentTag.tag_id
+                    == select(Tag.id).where(Tag.name == search.tag).scalar_subquery(),
+                )
+            )
+        )
+
+    if search.status:
+        query = query.where(latest_status() == search.status)
+
+    if search.cursor:
+        created_at, id = decode_cursor(search.cursor, 2)
+        try:
+            position = (datetime.fromisoformat(created_at), UUID(id))
+        except (AttributeError, TypeError, ValueError):
+            raise BadRequest()
+        query = query.where(
+            tuple_(Shipment.created_at, Shipment.id) < tuple_(*position)
+        )
+
+    # one extra row tells whether there is a next page
+    return query.order_by(
+        col(Shipment.created_at).desc(), col(Shipment.id).desc()
+    ).limit(search.size + 1)
+
+
+def tagged_query(tag_name: TagName) -> Select:
+    """shipments carrying the tag, without loader options"""
+    return (
+        select(Shipment)
+        .join(ShipmentTag, col(ShipmentTag.shipment_id) == Shipment.id)
+        .join(Tag, col(Tag.id) == ShipmentTag.tag_id)
+        .where(Tag.name == tag_name)
+    )
+
+
 class ShipmentService(BaseService[Shipment]):
     def __init__(
         self,
@@ -33,34 +116,92 @@ class ShipmentService(BaseService[Shipment]):
         self.partner_service = partner_service
         self.event_service = event_service
 
-    async def list(self) -> Sequence[Shipment]:
-        results = await self.session.execute(select(Shipment))
-        return results.scalars().all()
+    async def list(self, fields: ShipmentFields) -> list[dict]:
+        shipments = (
+            await self.session.scalars(select(Shipment).options(*self._view_options(fields)))
+        ).all()
+        return await self._views(shipments, fields)
 
-    async def add(self, shipment_create: ShipmentCreate, seller: Seller) -> Shipment:
-        new_shipment = Shipment(
-            **shipment_create.model_dump(),
-            status=ShipmentStatus.placed,
-            estimated_delivery=datetime.now() + timedelta(days=3),
-            seller_id=seller.id,
+    async def tagged(self, tag_name: TagName, fields: ShipmentFields) -> list[dict]:
+        shipments = (
+            await self.session.scalars(
+                tagged_query(tag_name).options(*self._view_options(fields))
+            )
+        ).all()
+        return await self._views(shipments, fields)
+
+    async def get_view(self, id: UUID, fields: ShipmentFields) -> dict:
+        shipment = await self.session.get(
+            Shipment, id, options=self._view_options(fields)
+        )
+        if shipment is None:
+            raise EntityNotFound()
+        return (await self._views([shipment], fields))[0]
+
+    async def search(
+        self, search: ShipmentSearch, seller_id: UUID | None
+    ) -> tuple[list[dict], str | None]:
+        """newest shipments first, returns the page and the cursor of the next one
+
+        `seller_id` restricts the search to one seller's shipments, None is
+        only passed for support agents searching across sellers.
+        """
+        fields = ShipmentFields.parse(search.fields, search.timeline)
+        # created_at is part of the cursor
+        query = search_query(search, seller_id).options(
+            *self._view_options(fields, Shipment.created_at)  # type:ignore
         )
-        # Assign delivery partner
-        partner = await self.partner_service.assign_shipment(new_shipment)
-        new_shipment.delivery_partner_id = partner.id
 
-        # save shipment
-        shipment = await self._add(new_shipment)
+        shipments = (await self.session.execute(query)).scalars().all()
+        if len(shipments) <= search.size:
+            return await self._views(shipments, fields), None
 
-        # Add event service for shipment
-        event = await self.event_service.add(
-            shipment=shipment,
-            location=seller.zip_code,
-            status=ShipmentStatus.placed,
-            description=f"assigned to a delivery partner {partner.name}",
+        shipments = shipments[: search.size]
+        last = shipments[-1]
+        return (
+            await self._views(shipments, fields),
+            encode_cursor(last.created_at.isoformat(), last.id),
         )
-        shipment.timeline.append(event)
 
-        return shipment
+    async def add(self, shipment_create: ShipmentCreate, seller: Principal) -> Shipment:
+        new_shipment = Shipment(
+            **shipment_create.model_dump(),
+            status=ShipmentStatus.placed,
+            seller_id=seller.id,
+            # set so they are not lazy loaded once staged
+            timeline=[],
+            tags=[],
+        )
+        partner = None
+        # partner, shipment, its first event and the notification in one transaction
+        try:
+            async with self.unit_of_work():
+                # Assign delivery partner, its row stays locked until the commit
+                partner = await self.partner_service.assign_shipment(new_shipment)
+                new_shipment.delivery_partner_id = partner.id
+
+                # historical transit time of this lane, from memory
+                new_shipment.estimated_delivery = datetime.now() + eta_estimator.estimate(
+                    seller.zip_code, new_shipment.destination, partner.id
+                )
+
+                await self._stage(new_shipment)
+
+                event = await self.event_service.add(
+                    shipment=new_shipment,
+                    location=seller.zip_code,
+                    status=ShipmentStatus.placed,
+                    description=f"assigned to a delivery partner {partner.name}",
+                )
+                new_shipment.timeline.append(event)
+        except BaseException:
+            # rolled back, the slot taken in memory is free again,
+            # a failing after commit callback leaves a committed (persistent) shipment
+            if partner is not None and inspect(new_shipment).transient:
+                self.partner_service.release_shipment(partner.id)
+            raise
+
+        return new_shipment
 
     async def get(self, id: UUID) -> Shipment:
         shipment = await self._get(id)
@@ -73,17 +214,18 @@ class ShipmentService(BaseService[Shipment]):
         data = shipment_update.model_dump()
         if "estimated_delivery" in data:
             data["estimated_delivery"] = to_naive_utc(data["estimated_delivery"])
-        shipment.sqlmodel_update(data)
 
-        updated_shipment = await self._update(shipment)
+        async with self.unit_of_work():
+            shipment.sqlmodel_update(data)
+            await self._stage(shipment)
 
-        return updated_shipment
+        return shipment
 
     async def update_partial(
         self,
         id: UUID,
         shipment_update_partial: ShipmentUpdatePartial,
-        partner: DeliveryPartner,
+        partner: Principal,
     ) -> Shipment:
         shipment = await self.get(id)
 
@@ -106,24 +248,37 @@ class ShipmentService(BaseService[Shipment]):
         if shipment_update_partial.estimated_delivery:
             update["estimated_delivery"] = shipment_update_partial.estimated_delivery
 
-        shipment.sqlmodel_update(update)
+        # closing it again must not free the slot twice
+        was_open = shipment.closed_at is None
 
-        # add event
-        if len(update) > 1 or not shipment_update_partial.estimated_delivery:
-            await self.event_service.add(
-                shipment=shipment,
-                **update,
-            )
+        async with self.unit_of_work():
+            shipment.sqlmodel_update(update)
+            await self._stage(shipment)
 
-        updated_shipment = await self._update(shipment)
+            # add event
+            if len(update) > 1 or not shipment_update_partial.estimated_delivery:
+                event = await self.event_service.add(
+                    shipment=shipment,
+                    location=shipment_update_partial.location,
+                    status=shipment_update_partial.status,
+                    description=shipment_update_partial.description,
+                )
+                shipment.timeline.append(event)
 
-        return updated_shipment
+            # free the partner's slot once the shipment is closed
+            if was_open and shipment_update_partial.status in CLOSED_STATUSES:
+                self._release_after_commit(shipment)
+
+        return shipment
 
     async def delete(self, id: UUID) -> None:
         shipment = await self.get(id)
-        await self._delete(shipment)
+        async with self.unit_of_work():
+            await self.session.delete(shipment)
+            if shipment.closed_at is None:
+                self._release_after_commit(shipment)
 
-    async def cancel(self, id: UUID, seller: Seller) -> Shipment:
+    async def cancel(self, id: UUID, seller: Principal) -> Shipment:
         # get shipment
         shipment = await self.get(id)
 
@@ -131,12 +286,17 @@ class ShipmentService(BaseService[Shipment]):
         if shipment.seller_id != seller.id:
             raise ClientNotAuthorized()
 
-        event = await self.event_service.add(
-            shipment=shipment,
-            status=ShipmentStatus.cancelled,
-        )
+        # already delivered or cancelled, its slot was freed then
+        was_open = shipment.closed_at is None
 
-        shipment.timeline.append(event)
+        async with self.unit_of_work():
+            event = await self.event_service.add(
+                shipment=shipment,
+                status=ShipmentStatus.cancelled,
+            )
+            shipment.timeline.append(event)
+            if was_open:
+                self._release_after_commit(shipment)
 
         return shipment
 
@@ -155,8 +315,8 @@ class ShipmentService(BaseService[Shipment]):
             shipment_id=shipment.id,
         )
 
-        self.session.add(review_model)
-        await self.session.commit()
+        async with self.unit_of_work():
+            await self._stage(review_model)
 
         return review_model
 
@@ -166,8 +326,11 @@ class ShipmentService(BaseService[Shipment]):
         if tag is None:
             raise EntityNotFound()
 
-        shipment.tags.append(tag)
-        return await self._update(shipment)
+        async with self.unit_of_work():
+            shipment.tags.append(tag)
+            await self._stage(shipment)
+
+        return shipment
 
     async def remove_tag(self, id: UUID, tag_name: TagName):
         shipment = await self.get(id)
@@ -176,8 +339,62 @@ class ShipmentService(BaseService[Shipment]):
             tag = await tag_name.tag(self.session)
             if tag is None:
                 raise EntityNotFound()
-            shipment.tags.remove(tag)
-            return await self._update(shipment)
+            async with self.unit_of_work():
+                shipment.tags.remove(tag)
+                await self._stage(shipment)
+
+            return shipment
 
         except Exception:
             raise EntityNotFound()
+
+    def _view_options(self, fields: ShipmentFields, *columns) -> list:
+        # only the selected columns, the timeline only when it is sent in full
+        options = [
+            load_only(
+                Shipment.id,  # type:ignore
+                *(getattr(Shipment, name) for name in fields.selected & SHIPMENT_COLUMNS),
+                *columns,
+            ),
+            *shipment_list_options(),
+        ]
+        if not fields.full_timeline:
+            options.append(noload(Shipment.timeline))  # type:ignore
+        return options
+
+    async def _views(self, shipments: Sequence[Shipment], fields: ShipmentFields) -> list[dict]:
+        if "tags" in fields.selected:
+            await loaders(self.session).attach_tags(shipments)
+
+        latest = {}
+        if fields.latest_event:
+            events = await loaders(self.session).latest_event.load_many(
+                [shipment.id for shipment in shipments]
+            )
+            latest = {shipment.id: event for shipment, event in zip(shipments, events)}
+
+        views = []
+        for shipment in shipments:
+            view = {name: getattr(shipment, name) for name in fields.selected & SHIPMENT_COLUMNS}
+            event = latest.get(shipment.id)
+
+            if "status" in fields.selected:
+                view["status"] = shipment.status if fields.full_timeline else (
+                    event.status if event else None
+                )
+            if "timeline" in fields.selected:
+                view["timeline"] = shipment.timeline if fields.full_timeline else (
+                    [event] if event else []
+                )
+            if "tags" in fields.selected:
+                view["tags"] = shipment.tags
+            views.append(view)
+        return views
+
+    def _release_after_commit(self, shipment: Shipment):
+        partner_id = shipment.delivery_partner_id
+
+        async def release():
+            self.partner_service.release_shipment(partner_id)
+
+        self._after_commit(release)
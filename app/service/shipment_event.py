@@ -1,20 +1,36 @@
+from datetime import datetime
 from random import randint
 from fastapi import BackgroundTasks
+from fastapi.encoders import jsonable_encoder
 from app.config import app_settings
-from app.database.redis import add_shipment_verification_code
+from app.database.redis import add_shipment_verification_code, publish_shipment_event
+from app.core.exception import DependencyUnavailable, EntityNotFound
 from app.service.base import BaseService
-from app.database.models import Shipment, ShipmentEvent, ShipmentStatus
+from app.database.models import (
+    CLOSED_STATUSES,
+    DeliveryPartner,
+    Outbox,
+    Seller,
+    Shipment,
+    ShipmentEvent,
+    ShipmentStatus,
+)
+from app.database.loader import loaders
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
 
 from app.service.notification import NotificationService
+from app.service.webhook import WebhookService
 from app.utils import generate_url_safe_token, generate_verification_code
-from app.worker.tasks import send_email_with_template
+from app.worker import names
 
 
 class ShipmentEventService(BaseService[ShipmentEvent]):
     def __init__(self, session: AsyncSession, tasks: BackgroundTasks):
         super().__init__(ShipmentEvent, session)
         self.notification_service = NotificationService(tasks)
+        self.webhook_service = WebhookService(session)
 
     async def add(
         self,
@@ -28,7 +44,7 @@ class ShipmentEventService(BaseService[ShipmentEvent]):
             location = location if location else last_event.location
             status = status if status else last_event.status
 
-        new_event = ShipmentEvent(
+        event = ShipmentEvent(
             location=location,
             status=status,
             description=(
@@ -39,15 +55,36 @@ class ShipmentEventService(BaseService[ShipmentEvent]):
             shipment_id=shipment.id,
         )
 
-        # send notification
-        await self._notify(shipment=shipment, status=status)
+        async with self.unit_of_work():
+            # queue notification, committed together with the event
+            await self._notify(shipment=shipment, status=status)
+            if status in CLOSED_STATUSES:
+                # drops the shipment out of the overdue scan index
+                shipment.closed_at = datetime.now()
+            await self._stage(event)
+            loaders(self.session).latest_event.prime(shipment.id, event)
 
-        return await self._add(new_event)
+            # sellers with webhooks get the event pushed instead of polling
+            await self.webhook_service.enqueue(shipment.seller_id, event)
+
+            # push to live tracking streams once committed
+            self._after_commit(lambda: self._publish(event))
+
+        return event
+
+    async def _publish(self, event: ShipmentEvent):
+        try:
+            await publish_shipment_event(event.shipment_id, event.model_dump_json())
+        except DependencyUnavailable:
+            # live tracking is best effort, clients still see it on reconnect
+            pass
 
     async def get_latest_event(self, shipment: Shipment) -> ShipmentEvent:
-        timeline = shipment.timeline
-        timeline.sort(key=lambda item: item.created_at)
-        return timeline[-1]
+        # batched with the lookups of other shipments in this request
+        event = await loaders(self.session).latest_event.load(shipment.id)
+        if event is None:
+            raise EntityNotFound()
+        return event
 
     def _generate_description(self, status: ShipmentStatus, location: int):
         match status:
@@ -69,12 +106,12 @@ class ShipmentEventService(BaseService[ShipmentEvent]):
         subject: str
         context = {}
         template_name:str
+        queue: str | None = None
 
         match (status):
             case ShipmentStatus.placed:
                 subject="Your Order is Shipped 🚛"
-                context["seller"] = shipment.seller.name
-                context["partner"] = shipment.delivery_partner.name
+                context["seller"], context["partner"] = await self._party_names(shipment)
                 context["id"] = shipment.id
                 template_name="mail_placed.html"
 
@@ -96,10 +133,12 @@ class ShipmentEventService(BaseService[ShipmentEvent]):
                 #     context["verification_code"] = code
 
                 context["verification_code"] = code
+                # the courier waits at the door for this one
+                queue = names.CRITICAL_QUEUE
                 
             case ShipmentStatus.delivered:
                 subject = "Your Order is Delivered ✅"
-                context["seller"] = shipment.seller.name
+                context["seller"], _ = await self._party_names(shipment)
                 token = generate_url_safe_token({"id": str(shipment.id)}, salt="shipment-review")
                 context["review_url"] = f"{app_settings.APP_DOMAIN}/shipment/review?token={token}"
                 template_name = "mail_delivered.html"
@@ -116,10 +155,34 @@ class ShipmentEventService(BaseService[ShipmentEvent]):
         #     template_name=template_name,
         # )
 
-        ### Use Celery
-        send_email_with_template.delay(
-            recipients=[shipment.client_contact_email],
-            subject=subject,
-            context=context,
-            template_name=template_name,
+        ### Use Celery through the outbox, published by the outbox relay
+        self.session.add(
+            Outbox(
+                task=names.SEND_EMAIL_WITH_TEMPLATE,
+                queue=queue,
+                payload=jsonable_encoder(
+                    {
+                        "recipients": [shipment.client_contact_email],
+                        "subject": subject,
+                        "context": context,
+                        "template_name": template_name,
+                    }
+                ),
+            )
         )
+
+    async def _party_names(self, shipment: Shipment) -> tuple[str, str]:
+        """seller and partner name, without loading them on a just staged shipment"""
+        unloaded = inspect(shipment).unloaded
+        if "seller" not in unloaded and "delivery_partner" not in unloaded:
+            return shipment.seller.name, shipment.delivery_partner.name
+
+        row = (
+            await self.session.execute(
+                select(Seller.name, DeliveryPartner.name).where(
+                    Seller.id == shipment.seller_id,
+                    DeliveryPartner.id == shipment.delivery_partner_id,
+                )
+            )
+        ).one()
+        return row[0], row[1]
@@ -3,7 +3,7 @@ from typing import Generic, TypeVar
 from uuid import UUID
 from fastapi import BackgroundTasks, HTTPException, status
 from pydantic import EmailStr
-from sqlalchemy import select
+from sqlalchemy import Select, select
 from app.config import app_settings
 from app.core.exception import BadCredentials, EntityNotFound, InvalidToken
 from app.service.base import BaseService
@@ -17,13 +17,19 @@ from app.utils import (
     generate_access_token,
     generate_url_safe_token,
 )
-from app.worker.tasks import send_email_with_template
+from app.worker import names
+from app.worker.dispatch import dispatch_task
 
 
 U = TypeVar("U", bound=User)
 hash_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+def email_query(model: type[User], email: str) -> Select:
+    """the seller or delivery partner signed up with the email"""
+    return select(model).where(model.email == email)  # type:ignore
+
+
 class UserService(Generic[U], BaseService[U]):
     def __init__(self, model: type[U], session: AsyncSession, tasks: BackgroundTasks):
         self.model = model
@@ -51,7 +57,8 @@ class UserService(Generic[U], BaseService[U]):
         # )
 
         ### Use Celery
-        send_email_with_template.delay(
+        await dispatch_task(
+            names.SEND_EMAIL_WITH_TEMPLATE,
             recipients=[user.email],
             subject="verify your account with fastship",
             context={
@@ -59,6 +66,7 @@ class UserService(Generic[U], BaseService[U]):
                 "verification_url": f"{app_settings.APP_DOMAIN}/{router_prefix}/verify?token={token}",
             },
             template_name="mail_verified_email.html",
+            options={"queue": names.CRITICAL_QUEUE},
         )
 
         return user
@@ -76,9 +84,7 @@ class UserService(Generic[U], BaseService[U]):
         await self._update(user)
 
     async def _get_by_email(self, email: str) -> U | None:
-        return await self.session.scalar(
-            select(self.model).where(self.model.email == email)  # type:ignore
-        )
+        return await self.session.scalar(email_query(self.model, email))
 
     async def _generate_token(self, email: str, password: str) -> str:
         # get user by email
@@ -123,7 +129,8 @@ class UserService(Generic[U], BaseService[U]):
         # )
 
         ### Use Celery
-        send_email_with_template.delay(
+        await dispatch_task(
+            names.SEND_EMAIL_WITH_TEMPLATE,
             recipients=[user.email],
             subject="reset your password from fastship",
             context={
@@ -131,6 +138,7 @@ class UserService(Generic[U], BaseService[U]):
                 "reset_password_url": f"{app_settings.APP_DOMAIN}/{router_prefix}/reset-password?token={token}",
             },
             template_name="mail_reset_password.html",
+            options={"queue": names.CRITICAL_QUEUE},
         )
 
     async def reset_password(self, token: str, password: str) -> bool:
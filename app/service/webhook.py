@@ -0,0 +1,113 @@
+import asyncio
+import secrets
+import socket
+import time
+from typing import Sequence
+from urllib.parse import urlsplit
+from uuid import UUID
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import col, select
+
+from app.config import webhook_settings
+from app.core.exception import EntityNotFound, WebhookTargetNotAllowed
+from app.core.principal import Principal
+from app.database.models import Outbox, ShipmentEvent, Webhook
+from app.service.base import BaseService
+from app.utils import resolve_public_address
+from app.worker import names
+
+
+class WebhookCache:
+    """Webhook ids per seller, so writing an event doesn't query them every time
+
+    Only ids are cached, the worker loads url and secret when it delivers,
+    a deleted webhook gets no more deliveries even while it is still cached here.
+    """
+
+    def __init__(self, ttl: float = webhook_settings.WEBHOOK_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: dict[UUID, tuple[float, list[UUID]]] = {}
+
+    async def get(self, session: AsyncSession, seller_id: UUID) -> list[UUID]:
+        entry = self._entries.get(seller_id)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        ids = list(
+            await session.scalars(
+                select(Webhook.id).where(Webhook.seller_id == seller_id)
+            )
+        )
+        self._entries[seller_id] = (time.monotonic() + self.ttl, ids)
+        return ids
+
+    def invalidate(self, seller_id: UUID):
+        self._entries.pop(seller_id, None)
+
+
+webhook_cache = WebhookCache()
+
+
+class WebhookService(BaseService[Webhook]):
+    def __init__(self, session: AsyncSession):
+        super().__init__(Webhook, session)
+
+    async def list(self, seller: Principal) -> Sequence[Webhook]:
+        return (
+            await self.session.scalars(
+                select(Webhook)
+                .where(Webhook.seller_id == seller.id)
+                .order_by(col(Webhook.created_at))
+            )
+        ).all()
+
+    async def create(self, seller: Principal, url: str) -> Webhook:
+        await self._check_target(url)
+
+        webhook = Webhook(url=url, secret=secrets.token_urlsafe(32), seller_id=seller.id)
+        async with self.unit_of_work():
+            await self._stage(webhook)
+            self._after_commit(self._invalidate(seller.id))
+        return webhook
+
+    async def delete(self, seller: Principal, id: UUID) -> None:
+        webhook = await self._get(id)
+        if webhook is None or webhook.seller_id != seller.id:
+            raise EntityNotFound()
+
+        async with self.unit_of_work():
+            await self.session.delete(webhook)
+            self._after_commit(self._invalidate(seller.id))
+
+    async def _check_target(self, url: str):
+        # checked again by the worker before every delivery, dns may change
+        target = urlsplit(url)
+        try:
+            await asyncio.to_thread(
+                resolve_public_address,
+                target.hostname or "",
+                target.port or (443 if target.scheme == "https" else 80),
+                webhook_settings.WEBHOOK_ALLOW_PRIVATE_TARGETS,
+            )
+        except (ValueError, socket.gaierror):
+            raise WebhookTargetNotAllowed()
+
+    def _invalidate(self, seller_id: UUID):
+        async def invalidate():
+            webhook_cache.invalidate(seller_id)
+
+        return invalidate
+
+    async def enqueue(self, seller_id: UUID, event: ShipmentEvent):
+        """queue the event for every webhook of the seller, committed with the event"""
+        payload = jsonable_encoder(event)
+        for webhook_id in await webhook_cache.get(self.session, seller_id):
+            # the secret never leaves the webhook table
+            self.session.add(
+                Outbox(
+                    task=names.BUFFER_WEBHOOK_EVENT,
+                    payload={"webhook_id": str(webhook_id), "event": payload},
+                )
+            )
@@ -0,0 +1,19 @@
+"""Access token for a support agent
+
+    python -m app.support --name alice --hours 8
+
+Support tokens search shipments of every seller (`GET /shipment/search`),
+they are signed with JWT_SECRET and revoked like any other token.
+"""
+import argparse
+from datetime import timedelta
+
+from app.utils import generate_support_token
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.support")
+    parser.add_argument("--name", required=True)
+    parser.add_argument("--hours", type=int, default=8)
+    args = parser.parse_args()
+
+    print(generate_support_token(args.name, timedelta(hours=args.hours)))
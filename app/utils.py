@@ -3,14 +3,18 @@ from pathlib import Path
 from fastapi import HTTPException, status
 from jwt import ExpiredSignatureError, encode, decode, PyJWTError
 from app.config import security_settings as settings
-from uuid import uuid4
+from uuid import NAMESPACE_URL, uuid4, uuid5
 from itsdangerous import (
     BadSignature,
     Serializer,
     SignatureExpired,
     URLSafeTimedSerializer,
 )
+import hashlib
+import hmac
+import ipaddress
 import secrets
+import socket
 
 # Directory
 APP_DIR = Path(__file__).resolve().parent
@@ -20,8 +24,12 @@ TEMPLATE_DIR = APP_DIR / "templates"
 _serializer = URLSafeTimedSerializer(settings.JWT_SECRET)
 
 
+# lifetime of access tokens, a logged out jti must be remembered as long
+ACCESS_TOKEN_EXPIRY = timedelta(days=1)
+
+
 # Method utils
-def generate_access_token(data: dict, expiry: timedelta = timedelta(days=1)) -> str:
+def generate_access_token(data: dict, expiry: timedelta = ACCESS_TOKEN_EXPIRY) -> str:
     return encode(
         payload={
             **data,
@@ -33,6 +41,25 @@ def generate_access_token(data: dict, expiry: timedelta = timedelta(days=1)) ->
     )
 
 
+# support agents search across sellers, their tokens carry this scope
+# and have no seller or partner row behind them
+SUPPORT_SCOPE = "support"
+
+
+def generate_support_token(name: str, expiry: timedelta = ACCESS_TOKEN_EXPIRY) -> str:
+    return generate_access_token(
+        data={
+            "user": {
+                "name": name,
+                # stable per agent, rate limits and idempotency keys are per user id
+                "id": str(uuid5(NAMESPACE_URL, f"support:{name}")),
+            },
+            "scope": SUPPORT_SCOPE,
+        },
+        expiry=expiry,
+    )
+
+
 def decode_access_token(token: str) -> dict | None:
     try:
         return decode(
@@ -57,5 +84,23 @@ def decode_url_safe_token(token: str, expiry: timedelta | None = None, salt:str|
     except (BadSignature, SignatureExpired):
         return None
 
+# webhook signature header, hmac of "<timestamp>.<body>" so a captured body can't be replayed later
+def sign_webhook(secret: str, timestamp: str, body: bytes) -> str:
+    digest = hmac.new(
+        secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+# webhook targets, sellers choose the url and the worker posts to it,
+# loopback, private and link local addresses (metadata, redis, postgres) are refused
+def resolve_public_address(host: str, port: int, allow_private: bool = False) -> str:
+    addresses = {
+        info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    }
+    for address in () if allow_private else addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise ValueError(f"{host} resolves to non public address {address}")
+    return sorted(addresses)[0]
+
 def generate_verification_code():
     return secrets.randbelow(999_999) + 100_000
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""Start one celery worker per queue, each with its own concurrency
+
+    python -m app.worker
+    python -m app.worker --queues critical notifications --pool gevent
+
+A backlog in one queue only occupies the workers of that queue, the
+critical queue (verification codes, password resets) always has its own.
+"""
+import argparse
+import signal
+import subprocess
+import sys
+import time
+
+from app.config import worker_settings
+from app.worker import names
+
+CONCURRENCY = {
+    names.CRITICAL_QUEUE: worker_settings.WORKER_CRITICAL_CONCURRENCY,
+    names.NOTIFICATIONS_QUEUE: worker_settings.WORKER_NOTIFICATIONS_CONCURRENCY,
+    names.WEBHOOKS_QUEUE: worker_settings.WORKER_WEBHOOKS_CONCURRENCY,
+    names.BULK_QUEUE: worker_settings.WORKER_BULK_CONCURRENCY,
+}
+
+
+def worker_command(queue: str, pool: str, loglevel: str) -> list[str]:
+    return [
+        sys.executable,
+        "-m",
+        "celery",
+        "-A",
+        "app.worker.tasks",
+        "worker",
+        "-Q",
+        queue,
+        "-c",
+        str(CONCURRENCY[queue]),
+        "-P",
+        pool,
+        "-n",
+        f"{queue}@%h",
+        "-l",
+        loglevel,
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.worker")
+    parser.add_argument("--queues", nargs="+", choices=names.QUEUES, default=names.QUEUES)
+    parser.add_argument("--pool", default=worker_settings.WORKER_POOL)
+    parser.add_argument("--loglevel", default="info")
+    args = parser.parse_args()
+
+    workers = [
+        subprocess.Popen(worker_command(queue, args.pool, args.loglevel))
+        for queue in args.queues
+    ]
+
+    def stop(signum, _):
+        # celery does a warm shutdown on SIGTERM, running tasks finish first
+        for worker in workers:
+            if worker.poll() is None:
+                worker.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # one worker exiting stops the others, the process supervisor restarts the set
+    while all(worker.poll() is None for worker in workers):
+        time.sleep(1)
+    stop(signal.SIGTERM, None)
+
+    sys.exit(max(worker.wait() for worker in workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+from celery import Celery
+from kombu import Queue
+
+from app.config import db_settings, overdue_settings, resilience_settings
+from app.worker import names
+
+app = Celery(
+    "api_task",
+    broker=db_settings.get_redis_url(9),
+    backend=db_settings.get_redis_url(9),
+)
+
+app.conf.update(
+    task_queues=[Queue(name) for name in names.QUEUES],
+    task_default_queue=names.BULK_QUEUE,
+    # default queue of every task, a message can still be sent to another one
+    # (verification codes and password resets go to the critical queue)
+    task_routes={
+        names.SEND_MAIL: {"queue": names.NOTIFICATIONS_QUEUE},
+        names.SEND_EMAIL_WITH_TEMPLATE: {"queue": names.NOTIFICATIONS_QUEUE},
+        names.SEND_SMS: {"queue": names.CRITICAL_QUEUE},
+        names.BUFFER_WEBHOOK_EVENT: {"queue": names.WEBHOOKS_QUEUE},
+        names.FLUSH_WEBHOOK: {"queue": names.WEBHOOKS_QUEUE},
+        names.DELIVER_WEBHOOK: {"queue": names.WEBHOOKS_QUEUE},
+        names.SCAN_OVERDUE_SHIPMENTS: {"queue": names.BULK_QUEUE},
+    },
+    broker_transport_options={
+        # queues are polled in the order they are consumed, not round robin
+        "queue_order_strategy": "priority",
+        "socket_connect_timeout": resilience_settings.BROKER_TIMEOUT,
+    },
+    # a publish gives up within seconds, callers are guarded by a circuit breaker
+    broker_connection_timeout=resilience_settings.BROKER_TIMEOUT,
+    task_publish_retry_policy={
+        "max_retries": 2,
+        "interval_start": 0,
+        "interval_step": 0.2,
+        "interval_max": 0.5,
+    },
+    # nothing reads task results, don't fill the result backend with them
+    task_ignore_result=True,
+    # reserve one message at a time so a slow task doesn't hold back others
+    worker_prefetch_multiplier=1,
+)
+
+# periodic jobs, run with `celery -A app.worker.tasks beat`
+app.conf.beat_schedule = {
+    "scan-overdue-shipments": {
+        "task": names.SCAN_OVERDUE_SHIPMENTS,
+        "schedule": overdue_settings.OVERDUE_SCAN_INTERVAL,
+        # a run that waited a whole interval is covered by the next one
+        "options": {"expires": overdue_settings.OVERDUE_SCAN_INTERVAL},
+    },
+}
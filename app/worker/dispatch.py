@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Literal
+
+from kombu.exceptions import OperationalError
+
+from app.config import dispatch_settings, resilience_settings
+from app.core.exception import DependencyUnavailable
+from app.core.resilience import CircuitBreaker
+
+if TYPE_CHECKING:
+    from celery import Task
+
+logger = logging.getLogger(__name__)
+
+DispatchPolicy = Literal["block", "drop"]
+
+# publishes to the broker from the producer thread and the outbox relay, the
+# timeouts are set on the celery connection (see celery_app)
+broker_breaker = CircuitBreaker(
+    "broker",
+    timeout=resilience_settings.BROKER_TIMEOUT,
+    errors=(OperationalError, OSError),
+)
+
+
+@dataclass
+class _Message:
+    task: str
+    kwargs: dict[str, Any]
+    options: dict[str, Any] = field(default_factory=dict)
+
+
+_STOP = object()
+
+
+class TaskDispatcher:
+    """Publish celery tasks from a dedicated producer thread
+
+    The event loop only puts messages on a bounded queue, the broker round trip
+    happens on the producer thread over one persistent connection.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = dispatch_settings.TASK_DISPATCH_QUEUE_SIZE,
+        policy: DispatchPolicy = dispatch_settings.TASK_DISPATCH_POLICY,
+        block_timeout: float = dispatch_settings.TASK_DISPATCH_BLOCK_TIMEOUT,
+    ):
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+
+        # backpressure metrics
+        self.submitted = 0
+        self.published = 0
+        self.dropped = 0
+        self.failed = 0
+        self.blocked = 0
+        self.max_queue_depth = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="celery-producer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """flush pending messages and stop the producer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    async def dispatch(
+        self,
+        task: "Task | str",
+        policy: DispatchPolicy | None = None,
+        options: dict[str, Any] | None = None,
+        **kwargs,
+    ) -> bool:
+        """queue a task for publishing, return False when it was dropped"""
+        message = _Message(
+            task=task if isinstance(task, str) else task.name,
+            kwargs=kwargs,
+            options=options or {},
+        )
+        self.submitted += 1
+
+        if self._try_put(message):
+            return True
+
+        if (policy or self.policy) == "block":
+            # wait for room without blocking the event loop
+            self.blocked += 1
+            deadline = time.monotonic() + self.block_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.005)
+                if self._try_put(message):
+                    return True
+
+        self.dropped += 1
+        logger.warning("task %s dropped, dispatch queue is full", message.task)
+        return False
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "max_queue_depth": self.max_queue_depth,
+            "submitted": self.submitted,
+            "published": self.published,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "blocked": self.blocked,
+        }
+
+    def _try_put(self, message: _Message) -> bool:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            return False
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return True
+
+    def _run(self):
+        # celery is only imported by the producer thread, off the startup path
+        from app.worker.celery_app import app as celery_app
+
+        producer = None
+        while True:
+            message = self._queue.get()
+            if message is _STOP:
+                break
+
+            def publish():
+                nonlocal producer
+                if producer is None:
+                    producer = celery_app.producer_pool.acquire(
+                        block=True, timeout=resilience_settings.BROKER_TIMEOUT
+                    )
+                celery_app.send_task(
+                    message.task,
+                    kwargs=message.kwargs,
+                    producer=producer,
+                    **message.options,
+                )
+
+            try:
+                broker_breaker.run(publish)
+                self.published += 1
+            except Exception as error:
+                self.failed += 1
+                if isinstance(error, DependencyUnavailable) and error.__cause__ is None:
+                    # breaker open, fail fast without touching the connection,
+                    # the message is lost (repeats are sampled by the log handler)
+                    logger.warning(
+                        "task %s dropped, broker unavailable",
+                        message.task,
+                        extra={"queue": message.options.get("queue")},
+                    )
+                    continue
+                logger.exception("failed to publish task %s", message.task)
+
+                # close the broken connection before it goes back to the pool,
+                # a new one is established on the next message
+                if producer is not None:
+                    producer.connection.collect()
+                    producer.release()
+                    producer = None
+
+        if producer is not None:
+            producer.release()
+
+
+dispatcher = TaskDispatcher()
+
+
+async def dispatch_task(
+    task: "Task | str",
+    policy: DispatchPolicy | None = None,
+    options: dict[str, Any] | None = None,
+    **kwargs,
+) -> bool:
+    return await dispatcher.dispatch(task, policy=policy, options=options, **kwargs)
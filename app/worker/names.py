@@ -0,0 +1,15 @@
+# task names, the api dispatches by name so it never imports the worker modules
+SEND_MAIL = "app.worker.tasks.send_mail"
+SEND_EMAIL_WITH_TEMPLATE = "app.worker.tasks.send_email_with_template"
+SEND_SMS = "app.worker.tasks.send_sms"
+BUFFER_WEBHOOK_EVENT = "app.worker.tasks.buffer_webhook_event"
+FLUSH_WEBHOOK = "app.worker.tasks.flush_webhook"
+DELIVER_WEBHOOK = "app.worker.tasks.deliver_webhook"
+SCAN_OVERDUE_SHIPMENTS = "app.worker.tasks.scan_overdue_shipments"
+
+# queues, highest priority first, a worker consuming several drains them in this order
+CRITICAL_QUEUE = "critical"
+NOTIFICATIONS_QUEUE = "notifications"
+WEBHOOKS_QUEUE = "webhooks"
+BULK_QUEUE = "bulk"
+QUEUES = (CRITICAL_QUEUE, NOTIFICATIONS_QUEUE, WEBHOOKS_QUEUE, BULK_QUEUE)
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from typing import Sequence
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import col, select
+
+from app.config import outbox_settings
+from app.core.exception import DependencyUnavailable
+from app.database.models import Outbox
+from app.database.session import get_engine
+from app.worker.dispatch import broker_breaker
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """Publish committed outbox rows to celery in batches"""
+
+    def __init__(
+        self,
+        batch_size: int = outbox_settings.OUTBOX_BATCH_SIZE,
+        poll_interval: float = outbox_settings.OUTBOX_POLL_INTERVAL,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+    async def run(self):
+        while True:
+            try:
+                published = await self.relay_batch()
+            except DependencyUnavailable:
+                # rows stay in the outbox until the broker is back
+                published = 0
+            except Exception:
+                logger.exception("outbox relay failed")
+                published = 0
+
+            # keep draining while there is a backlog
+            if published < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def relay_batch(self) -> int:
+        async with AsyncSession(get_engine(), expire_on_commit=False) as session:
+            # rows locked by another relay are skipped, not waited on,
+            # uuid7 ids are time ordered so the primary key gives the oldest first
+            rows = (
+                await session.scalars(
+                    select(Outbox)
+                    .order_by(col(Outbox.id))
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+
+            if not rows:
+                return 0
+
+            # publish before delete, a crash in between re-sends (at least once)
+            await asyncio.to_thread(broker_breaker.run, lambda: self._publish(rows))
+
+            await session.execute(
+                delete(Outbox).where(col(Outbox.id).in_([row.id for row in rows]))
+            )
+            await session.commit()
+
+            return len(rows)
+
+    def _publish(self, rows: Sequence[Outbox]):
+        from app.worker.celery_app import app as celery_app
+
+        # one broker connection for the whole batch
+        with celery_app.producer_or_acquire() as producer:
+            for row in rows:
+                options = {"queue": row.queue} if row.queue else {}
+                celery_app.send_task(
+                    row.task, kwargs=row.payload, producer=producer, **options
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(OutboxRelay().run())
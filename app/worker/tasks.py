@@ -1,41 +1,63 @@
-from celery import Celery
+import json
+import logging
+import time
+from functools import cache
+from typing import TYPE_CHECKING
+
 from pydantic import EmailStr
-from app.config import db_settings, notification_settings
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
-from twilio.rest import Client
 from asgiref.sync import async_to_sync
-from app.utils import TEMPLATE_DIR
-
-fastmail = FastMail(
-    ConnectionConfig(
-        **notification_settings.model_dump(
-            exclude={"TWILIO_AUTH_TOKEN", "TWILIO_SID", "TWILIO_PHONE_NUMBER"}
-        ),
-        TEMPLATE_FOLDER=TEMPLATE_DIR
-    )
-)
+from celery.signals import worker_init
+from app.config import db_settings, notification_settings, webhook_settings
+# only the module, the clients are created on first use
+from app.core.clients import get_fastmail, get_twilio_client
+from app.utils import resolve_public_address, sign_webhook
+from app.worker import names
+from app.worker.celery_app import app
 
-twilio_client = Client(
-    notification_settings.TWILIO_SID,
-    notification_settings.TWILIO_AUTH_TOKEN,
-)
+if TYPE_CHECKING:
+    from httpx import Client as HttpClient
+    from redis import Redis
 
-send_message = async_to_sync(fastmail.send_message)
+logger = logging.getLogger(__name__)
 
 
-app = Celery(
-    "api_task",
-    broker=db_settings.get_redis_url(9),
-    backend=db_settings.get_redis_url(9),
-)
+def send_message(**kwargs):
+    return async_to_sync(get_fastmail().send_message)(**kwargs)
+
+
+@worker_init.connect
+def precompile_mail_templates(**_):
+    # before the pool starts, prefork children inherit the compiled templates
+    from app.core.templating import precompile_templates
+
+    precompile_templates()
+
+
+async def _send_template(
+    recipients: list[str], subject: str, context: dict, template_name: str
+):
+    from fastapi_mail import MessageSchema, MessageType
+    from app.core.templating import render_template
+
+    # rendered by the shared environment, fastapi-mail would build a new one per message
+    await get_fastmail().send_message(
+        MessageSchema(
+            recipients=recipients,
+            subject=subject,
+            body=await render_template(template_name, context),
+            subtype=MessageType.html,
+        )
+    )
 
 
-@app.task
+@app.task(name=names.SEND_MAIL)
 def send_mail(
     recipients: list[str],
     subject: str,
     body: str,
 ):
+    from fastapi_mail import MessageSchema, MessageType
+
     send_message(
         message=MessageSchema(
             recipients=recipients,
@@ -48,33 +70,182 @@ def send_mail(
     return "message sent"
 
 
-@app.task
+@app.task(name=names.SEND_EMAIL_WITH_TEMPLATE)
 def send_email_with_template(
     recipients: list[EmailStr],
     subject: str,
     context: dict,
     template_name: str,
 ):
-    send_message(
-        message=MessageSchema(
-            recipients=recipients,
-            subject=subject,
-            template_body=context,
-            subtype=MessageType.html,
-        ),
-        template_name=template_name,
-    )
+    async_to_sync(_send_template)(recipients, subject, context, template_name)
 
 
-@app.task
+@app.task(name=names.SEND_SMS)
 def send_sms(to: str, body: str):
-    twilio_client.messages.create(
+    get_twilio_client().messages.create(
         body=body,
         from_=notification_settings.TWILIO_PHONE_NUMBER,
         to=to,
     )
 
-@app.task
-def add_log(log:str) -> None:
-    with open("file.log", 'a') as file:
-        file.write(f"{log}\n")
\ No newline at end of file
+@cache
+def get_webhook_buffer() -> "Redis":
+    from redis import Redis
+
+    return Redis(host=db_settings.REDIS_HOST, port=db_settings.REDIS_PORT, db=4)
+
+
+@cache
+def get_http_client() -> "HttpClient":
+    from httpx import Client as HttpClient
+
+    # one pool per worker process, keeps connections to seller endpoints alive,
+    # a redirect could point anywhere, the address check only covers the registered url
+    return HttpClient(timeout=webhook_settings.WEBHOOK_TIMEOUT, follow_redirects=False)
+
+
+async def _load_webhook(webhook_id: str) -> tuple[str, str] | None:
+    from uuid import UUID
+
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlmodel import select
+
+    from app.database.models import Webhook
+    from app.database.session import dispose_engine, get_engine
+
+    # read on every delivery, deletes and new secrets apply to the next batch
+    try:
+        async with AsyncSession(get_engine()) as session:
+            row = (
+                await session.execute(
+                    select(Webhook.url, Webhook.secret).where(Webhook.id == UUID(webhook_id))
+                )
+            ).first()
+            return (row.url, row.secret) if row else None
+    finally:
+        # every run gets its own event loop, pooled connections can't outlive it
+        await dispose_engine()
+
+
+class WebhookDeliveryFailed(Exception):
+    """Seller endpoint unreachable or answered with a retryable status"""
+
+
+# events are buffered per webhook, the first event of a window schedules the flush
+@app.task(name=names.BUFFER_WEBHOOK_EVENT)
+def buffer_webhook_event(webhook_id: str, event: dict):
+    key = f"webhook:{webhook_id}"
+    with get_webhook_buffer().pipeline() as pipe:
+        pipe.rpush(f"{key}:events", json.dumps(event))
+        # expires on its own if the flush is lost, the next event schedules again
+        pipe.set(
+            f"{key}:scheduled",
+            1,
+            nx=True,
+            ex=int(webhook_settings.WEBHOOK_BATCH_WINDOW * 10) + 1,
+        )
+        scheduled = pipe.execute()[-1]
+
+    if scheduled:
+        flush_webhook.apply_async(
+            (webhook_id,), countdown=webhook_settings.WEBHOOK_BATCH_WINDOW
+        )
+
+
+@app.task(name=names.FLUSH_WEBHOOK)
+def flush_webhook(webhook_id: str):
+    key = f"webhook:{webhook_id}"
+    buffer = get_webhook_buffer()
+
+    # events arriving from now on schedule the next flush
+    buffer.delete(f"{key}:scheduled")
+
+    with buffer.pipeline() as pipe:
+        pipe.lrange(f"{key}:events", 0, webhook_settings.WEBHOOK_BATCH_SIZE - 1)
+        pipe.ltrim(f"{key}:events", webhook_settings.WEBHOOK_BATCH_SIZE, -1)
+        pipe.llen(f"{key}:events")
+        events, _, remaining = pipe.execute()
+
+    if events:
+        deliver_webhook.delay(webhook_id, [json.loads(event) for event in events])
+
+    # backlog larger than one batch, keep flushing without waiting a window
+    if remaining and buffer.set(f"{key}:scheduled", 1, nx=True, ex=60):
+        flush_webhook.delay(webhook_id)
+
+
+@app.task(
+    name=names.DELIVER_WEBHOOK,
+    autoretry_for=(WebhookDeliveryFailed,),
+    max_retries=webhook_settings.WEBHOOK_MAX_RETRIES,
+    retry_backoff=True,
+    retry_backoff_max=webhook_settings.WEBHOOK_BACKOFF_MAX,
+    retry_jitter=True,
+    acks_late=True,
+)
+def deliver_webhook(webhook_id: str, events: list[dict]) -> int | None:
+    from httpx import URL, HTTPError
+
+    target = async_to_sync(_load_webhook)(webhook_id)
+    if target is None:
+        logger.info("webhook %s deleted, %d events dropped", webhook_id, len(events))
+        return None
+
+    url, secret = URL(target[0]), target[1]
+    try:
+        # resolved once and connected to directly, dns can't change between check and post
+        address = resolve_public_address(
+            url.host,
+            url.port or (443 if url.scheme == "https" else 80),
+            webhook_settings.WEBHOOK_ALLOW_PRIVATE_TARGETS,
+        )
+    except ValueError as error:
+        logger.warning("webhook %s refused: %s", webhook_id, error)
+        return None
+    except OSError as error:
+        raise WebhookDeliveryFailed(str(error))
+
+    body = json.dumps({"events": events}).encode()
+    timestamp = str(int(time.time()))
+
+    try:
+        response = get_http_client().post(
+            url.copy_with(host=f"[{address}]" if ":" in address else address),
+            content=body,
+            headers={
+                "Host": url.netloc.decode("ascii"),
+                "Content-Type": "application/json",
+                "X-Fastship-Signature": sign_webhook(secret, timestamp, body),
+            },
+            # tls is still verified against the registered host name
+            extensions={"sni_hostname": url.host},
+        )
+    except HTTPError as error:
+        raise WebhookDeliveryFailed(str(error))
+
+    if response.status_code >= 500 or response.status_code in (408, 429):
+        raise WebhookDeliveryFailed(f"{url} answered {response.status_code}")
+
+    # redirects and other client errors won't succeed on retry, the batch is dropped
+    if response.status_code >= 300:
+        logger.warning(
+            "webhook %s rejected %d events: %d", url, len(events), response.status_code
+        )
+
+    return response.status_code
+
+
+async def _scan_overdue_shipments() -> int:
+    from app.database.session import dispose_engine
+    from app.service.overdue import scan_overdue_shipments as scan
+
+    try:
+        return await scan()
+    finally:
+        # every run gets its own event loop, pooled connections can't outlive it
+        await dispose_engine()
+
+
+@app.task(name=names.SCAN_OVERDUE_SHIPMENTS)
+def scan_overdue_shipments() -> int:
+    return async_to_sync(_scan_overdue_shipments)()
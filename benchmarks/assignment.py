@@ -0,0 +1,121 @@
+"""Simulate partner assignment with the in memory capacity index
+
+    python -m benchmarks.assignment --shipments 100000
+
+Reports assignments per second and how evenly load is spread over partners
+for each strategy, next to the previous first-fit behaviour.
+"""
+import argparse
+import random
+import statistics
+import time
+from collections import deque
+from uuid import uuid4
+
+from app.service.assignment import (
+    STRATEGIES,
+    CapacityIndex,
+    PartnerSlot,
+    WeightedCapacityStrategy,
+)
+
+
+class FirstFitStrategy:
+    """First partner with capacity left, in row order"""
+
+    def choose(self, zone, slots):
+        for slot in zone.partners:
+            if slot.remaining > 0:
+                return slot
+        return None
+
+
+def build_index(strategy, partners: int, zipcodes: int, seed: int) -> CapacityIndex:
+    rng = random.Random(seed)
+    index = CapacityIndex(strategy=strategy, ttl=float("inf"))
+    slots = [
+        PartnerSlot(id=uuid4(), name=f"partner-{i}", capacity=rng.randint(20, 200))
+        for i in range(partners)
+    ]
+
+    zones: dict[int, list[PartnerSlot]] = {zipcode: [] for zipcode in range(zipcodes)}
+    for slot in slots:
+        for zipcode in rng.sample(range(zipcodes), k=rng.randint(1, 5)):
+            zones[zipcode].append(slot)
+
+    for zipcode, zone in zones.items():
+        index.load_zone(zipcode, zone)
+    return index
+
+
+def simulate(strategy, args) -> dict:
+    index = build_index(strategy, args.partners, args.zipcodes, args.seed)
+    rng = random.Random(args.seed)
+    in_flight: deque = deque()
+    assigned = rejected = 0
+
+    start = time.perf_counter()
+    for _ in range(args.shipments):
+        slot = index.assign(rng.randrange(args.zipcodes))
+        if slot is None:
+            rejected += 1
+        else:
+            assigned += 1
+            in_flight.append(slot.id)
+
+        # deliveries close older shipments and free capacity
+        if len(in_flight) > args.in_flight:
+            index.release(in_flight.popleft())
+    elapsed = time.perf_counter() - start
+
+    utilization = [
+        slot.utilization for slot in index.slots.values() if slot.capacity > 0
+    ]
+    mean = statistics.fmean(utilization)
+    return {
+        "assigned": assigned,
+        "rejected": rejected,
+        "per_second": args.shipments / elapsed,
+        "mean_utilization": mean,
+        "stdev_utilization": statistics.pstdev(utilization),
+        "max_utilization": max(utilization),
+        "idle_partners": sum(1 for value in utilization if value == 0),
+        # jain's fairness index, 1.0 is a perfectly even spread
+        "fairness": sum(utilization) ** 2
+        / (len(utilization) * sum(value**2 for value in utilization) or 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shipments", type=int, default=100_000)
+    parser.add_argument("--partners", type=int, default=500)
+    parser.add_argument("--zipcodes", type=int, default=200)
+    parser.add_argument("--in-flight", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    strategies = {"first_fit": FirstFitStrategy()}
+    for name, strategy in STRATEGIES.items():
+        strategies[name] = (
+            WeightedCapacityStrategy(random.Random(args.seed))
+            if strategy is WeightedCapacityStrategy
+            else strategy()
+        )
+
+    print(
+        f"{'strategy':<14}{'assign/s':>12}{'rejected':>10}{'mean':>8}"
+        f"{'stdev':>8}{'max':>8}{'idle':>6}{'fairness':>10}"
+    )
+    for name, strategy in strategies.items():
+        result = simulate(strategy, args)
+        print(
+            f"{name:<14}{result['per_second']:>12,.0f}{result['rejected']:>10}"
+            f"{result['mean_utilization']:>8.2f}{result['stdev_utilization']:>8.2f}"
+            f"{result['max_utilization']:>8.2f}{result['idle_partners']:>6}"
+            f"{result['fairness']:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
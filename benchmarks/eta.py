@@ -0,0 +1,75 @@
+"""Backtest eta estimates against delivered shipments
+
+    python -m benchmarks.eta --test-days 14
+
+Builds the transit stats from deliveries older than the test window, the same
+way `refresh-eta` does, then estimates every delivery inside the window and
+reports the error next to the fixed default eta.
+"""
+import argparse
+import asyncio
+import statistics
+from datetime import datetime, timedelta
+
+from app.database.session import dispose_engine, get_engine, init_engine
+from app.service.eta import EtaEstimator, TransitSummary, aggregate, fetch_deliveries
+
+
+async def load(since: datetime, until: datetime, batch_size: int) -> list:
+    rows = []
+    async with get_engine().connect() as conn:
+        while batch := await fetch_deliveries(conn, since, until, batch_size):
+            rows.extend(batch)
+            since = batch[-1].delivered_at
+    return rows
+
+
+def report(name: str, errors: list[float]):
+    late = sum(error > 0 for error in errors) / len(errors)
+    absolute = sorted(abs(error) for error in errors)
+    print(
+        f"{name:<10} mae {statistics.fmean(absolute):>7.1f} h"
+        f"  median {statistics.median(absolute):>7.1f} h"
+        f"  p90 {absolute[int(len(absolute) * 0.9)]:>7.1f} h"
+        f"  late {late:>6.1%}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--test-days", type=int, default=14)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    init_engine()
+    split = datetime.now() - timedelta(days=args.test_days)
+    train = await load(datetime.min, split, args.batch_size)
+    test = await load(split, datetime.now(), args.batch_size)
+    await dispose_engine()
+
+    if not test:
+        raise SystemExit("no deliveries in the test window")
+
+    stats: dict = {}
+    for start in range(0, len(train), args.batch_size):
+        for lane, stat in aggregate(train[start : start + args.batch_size]).items():
+            stats.setdefault(lane, TransitSummary()).add(stat)
+
+    estimator = EtaEstimator()
+    estimator.load(stats)
+    default_hours = estimator.default.total_seconds() / 3600
+
+    # positive error, the shipment arrived after its eta
+    errors, baseline = [], []
+    for row in test:
+        eta = estimator.estimate(row.origin_zip, row.destination, row.delivery_partner_id)
+        errors.append(float(row.hours) - eta.total_seconds() / 3600)
+        baseline.append(float(row.hours) - default_hours)
+
+    print(f"{len(train)} deliveries in {len(stats)} lanes, {len(test)} tested")
+    report("estimator", errors)
+    report("default", baseline)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""Time spent in the caller per log record during an error storm
+
+    python -m benchmarks.logging_storm --records 100000 > /dev/null
+
+Logs the same handled error from several threads, once with a plain stream
+handler formatting and writing in the caller and once through the queue
+handler of app.core.logging. Results go to stderr so stdout can be discarded.
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+
+from app.core.logging import JsonFormatter, metrics, start_logging, stop_logging
+
+logger = logging.getLogger("benchmark.storm")
+
+
+def storm(records: int, threads: int) -> float:
+    def run():
+        for i in range(records // threads):
+            try:
+                raise ValueError(f"shipment {i} not found")
+            except ValueError:
+                logger.exception("handled %s", "EntityNotFound", extra={"path": "/shipment"})
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / records * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+
+    direct = logging.StreamHandler(sys.stdout)
+    direct.setFormatter(JsonFormatter())
+    root.addHandler(direct)
+    blocking = storm(args.records, args.threads)
+    root.removeHandler(direct)
+
+    start_logging()
+    queued = storm(args.records, args.threads)
+    counts = metrics()
+    stop_logging()
+
+    print(f"{'handler':<10}{'us/record':>11}", file=sys.stderr)
+    print(f"{'stream':<10}{blocking:>11.2f}", file=sys.stderr)
+    print(f"{'queue':<10}{queued:>11.2f}", file=sys.stderr)
+    print(
+        f"queue handler: {counts['suppressed']} sampled out, {counts['dropped']} dropped",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
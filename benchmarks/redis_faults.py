@@ -0,0 +1,171 @@
+"""Request path redis calls against a fault injecting redis stand-in
+
+    python -m benchmarks.redis_faults
+
+Starts a minimal redis server on localhost (GET, SET, EXISTS, PING, anything
+else answers OK), points the api redis clients at it and runs the token
+blacklist (BLACKLIST_FAIL_OPEN as configured) and verification code lookups
+while the stand-in is healthy, hangs, answers errors and recovers. Prints
+latency and breaker state per phase and exits non zero when a call blocked
+past its timeout or a policy was not applied.
+No real redis or database is needed.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+
+class FaultyRedis:
+    """Redis stand-in, `mode` is one of healthy, hang, error, close"""
+
+    def __init__(self):
+        self.mode = "healthy"
+        self.data: dict[bytes, bytes] = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while command := await self._read_command(reader):
+                if self.mode == "hang":
+                    # never answers, the client has to give up on its own
+                    await asyncio.sleep(3600)
+                if self.mode == "close":
+                    break
+                if self.mode == "error":
+                    writer.write(b"-ERR injected fault\r\n")
+                else:
+                    writer.write(self._reply(command))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> list[bytes] | None:
+        header = await reader.readline()
+        if not header.startswith(b"*"):
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _reply(self, command: list[bytes]) -> bytes:
+        name = command[0].upper()
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name == b"GET":
+            value = self.data.get(command[1])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if name == b"SET":
+            self.data[command[1]] = command[2]
+            return b"+OK\r\n"
+        if name == b"EXISTS":
+            return b":%d\r\n" % sum(key in self.data for key in command[1:])
+        # SELECT, CLIENT SETINFO, ...
+        return b"+OK\r\n"
+
+
+async def timed(operation) -> tuple[float, object]:
+    start = time.perf_counter()
+    try:
+        result = await operation()
+    except Exception as error:
+        result = error
+    return (time.perf_counter() - start) * 1000, result
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    # the app reads its settings on import
+    os.environ["REDIS_HOST"] = "127.0.0.1"
+    os.environ["REDIS_PORT"] = str(args.port)
+    os.environ.setdefault("BREAKER_RESET_TIMEOUT", "1")
+
+    from uuid import uuid4
+
+    from app.config import resilience_settings
+    from app.core.exception import DependencyUnavailable
+    from app.database import redis
+
+    stand_in = FaultyRedis()
+    server = await asyncio.start_server(stand_in.handle, "127.0.0.1", args.port)
+    budget_ms = resilience_settings.REDIS_TIMEOUT * 1000 + 50
+    failures = []
+
+    def check(ok: bool, message: str):
+        if not ok:
+            failures.append(message)
+
+    await redis.add_jti_to_blacklist("logged-out")
+    shipment_id = uuid4()
+    await redis.add_shipment_verification_code(shipment_id, 123456)
+
+    print(f"{'phase':<10}{'p50 ms':>8}{'max ms':>8}{'rejected':>10}  state")
+    for mode in ("healthy", "hang", "error", "close", "recovered"):
+        stand_in.mode = "healthy" if mode == "recovered" else mode
+        if mode == "recovered":
+            # let the breaker go half open and probe
+            await asyncio.sleep(resilience_settings.BREAKER_RESET_TIMEOUT)
+
+        rejected = redis.redis_breaker.rejected
+        latencies = []
+        for _ in range(args.calls):
+            latency, result = await timed(lambda: redis.is_jti_blacklisted("unknown"))
+            latencies.append(latency)
+            check(latency < budget_ms, f"{mode}: blacklist check took {latency:.0f} ms")
+            # unknown tokens are accepted when healthy or failing open, 503 otherwise
+            if mode in ("healthy", "recovered") or resilience_settings.BLACKLIST_FAIL_OPEN:
+                check(result is False, f"{mode}: blacklist check returned {result!r}")
+            else:
+                check(
+                    isinstance(result, DependencyUnavailable),
+                    f"{mode}: blacklist check returned {result!r}",
+                )
+
+        # logged out tokens stay rejected through the local cache
+        _, result = await timed(lambda: redis.is_jti_blacklisted("logged-out"))
+        check(result is True, f"{mode}: logged out token accepted")
+
+        # fail closed, a delivery can't be confirmed without the code
+        latency, result = await timed(lambda: redis.get_shipment_verification_code(shipment_id))
+        check(latency < budget_ms, f"{mode}: code lookup took {latency:.0f} ms")
+        if mode in ("healthy", "recovered"):
+            check(result == "123456", f"{mode}: code lookup returned {result!r}")
+        else:
+            check(
+                isinstance(result, DependencyUnavailable),
+                f"{mode}: code lookup returned {result!r}",
+            )
+
+        state = redis.redis_breaker.state.value
+        expected = "closed" if mode in ("healthy", "recovered") else "open"
+        check(state == expected, f"{mode}: breaker {state}, expected {expected}")
+
+        print(
+            f"{mode:<10}{statistics.median(latencies):>8.1f}{max(latencies):>8.1f}"
+            f"{redis.redis_breaker.rejected - rejected:>10}  {state}"
+        )
+        if mode != "recovered" and expected == "open":
+            # next phase starts from a closed breaker
+            await asyncio.sleep(resilience_settings.BREAKER_RESET_TIMEOUT)
+            stand_in.mode = "healthy"
+            await redis.is_jti_blacklisted("probe")
+
+    server.close()
+    await redis.close_redis()
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
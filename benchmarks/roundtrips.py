@@ -0,0 +1,158 @@
+"""Count database round trips of the shipment write paths
+
+    python -m benchmarks.roundtrips --runs 20
+
+Creates a throwaway seller and partner, then creates, updates and cancels
+shipments through ShipmentService while counting the statements and commits
+sent to postgres. Everything created is deleted afterwards.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+from uuid import uuid4
+
+from fastapi import BackgroundTasks
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.schemas.shipment import ShipmentCreate, ShipmentUpdatePartial
+from app.core.principal import Principal
+from app.database.models import DeliveryPartner, Seller, ShipmentStatus
+from app.database.session import dispose_engine, get_engine
+from app.service.delivery_partner import DeliverPartnerService
+from app.service.shipment import ShipmentService
+from app.service.shipment_event import ShipmentEventService
+
+CLIENT_EMAIL = "roundtrip@benchmark.fastship.com"
+ZIP_CODE = 99999
+
+
+class Counter:
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+
+    def attach(self, engine):
+        @event.listens_for(engine, "before_cursor_execute")
+        def _statement(*_):
+            self.statements += 1
+
+        @event.listens_for(engine, "commit")
+        def _commit(*_):
+            self.commits += 1
+
+    def take(self) -> tuple[int, int]:
+        counts = (self.statements, self.commits)
+        self.statements = self.commits = 0
+        return counts
+
+
+def service(session: AsyncSession) -> ShipmentService:
+    tasks = BackgroundTasks()
+    return ShipmentService(
+        session=session,
+        partner_service=DeliverPartnerService(session=session, tasks=tasks),
+        event_service=ShipmentEventService(session=session, tasks=tasks),
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = get_engine()
+    engine.sync_engine.echo = False
+    counter = Counter()
+    counter.attach(engine.sync_engine)
+
+    seller = Seller(
+        name="roundtrip seller",
+        email=f"{uuid4()}@benchmark.fastship.com",
+        password="-",
+        zip_code=ZIP_CODE,
+    )
+    partner = DeliveryPartner(
+        name="roundtrip partner",
+        email=f"{uuid4()}@benchmark.fastship.com",
+        password="-",
+        serviceable_zip_codes=[ZIP_CODE],
+        max_handling_capacity=args.runs + 1,
+    )
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add_all([seller, partner])
+        await session.commit()
+
+    seller_principal = Principal(id=seller.id, name=seller.name, zip_code=ZIP_CODE)
+    partner_principal = Principal(id=partner.id, name=partner.name, zip_code=None)
+
+    results: dict[str, list[tuple[int, int, float]]] = defaultdict(list)
+
+    async def measure(name: str, operation):
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            counter.take()
+            start = time.perf_counter()
+            result = await operation(service(session))
+            elapsed = time.perf_counter() - start
+            results[name].append((*counter.take(), elapsed))
+            return result
+
+    try:
+        for _ in range(args.runs):
+            shipment = await measure(
+                "add",
+                lambda s: s.add(
+                    ShipmentCreate(
+                        content="benchmark",
+                        weight=1,
+                        destination=ZIP_CODE,
+                        client_contact_email=CLIENT_EMAIL,
+                    ),
+                    seller_principal,
+                ),
+            )
+            await measure(
+                "update_partial",
+                lambda s: s.update_partial(
+                    shipment.id,
+                    ShipmentUpdatePartial(location=ZIP_CODE, status=ShipmentStatus.in_transit),
+                    partner_principal,
+                ),
+            )
+            await measure("cancel", lambda s: s.cancel(shipment.id, seller_principal))
+    finally:
+        async with engine.begin() as conn:
+            params = {"seller_id": seller.id, "partner_id": partner.id}
+            await conn.execute(
+                text(
+                    "DELETE FROM shipment_event WHERE shipment_id IN "
+                    "(SELECT id FROM shipment WHERE seller_id = :seller_id)"
+                ),
+                params,
+            )
+            await conn.execute(text("DELETE FROM shipment WHERE seller_id = :seller_id"), params)
+            await conn.execute(text("DELETE FROM seller WHERE id = :seller_id"), params)
+            await conn.execute(text("DELETE FROM delivery_partner WHERE id = :partner_id"), params)
+            await conn.execute(
+                text(
+                    "DELETE FROM outbox WHERE "
+                    "payload -> 'recipients' @> to_jsonb(CAST(:email AS text))"
+                ),
+                {"email": CLIENT_EMAIL},
+            )
+        await dispose_engine()
+
+    print(f"{'operation':<16}{'statements':>12}{'commits':>10}{'ms':>10}")
+    for name, runs in results.items():
+        print(
+            f"{name:<16}"
+            f"{statistics.median(run[0] for run in runs):>12.0f}"
+            f"{statistics.median(run[1] for run in runs):>10.0f}"
+            f"{statistics.median(run[2] for run in runs) * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""Import time budget for the api and the celery worker
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --module app.worker.tasks --budget-ms 400
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter,
+prints the slowest top level packages and exits non zero when the total
+import time exceeds the budget.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+# default budget per module in milliseconds
+BUDGETS = {
+    "app.main": 1500,
+    "app.worker.tasks": 600,
+}
+
+
+def measure(module: str) -> tuple[float, dict[str, float]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total = 0.0
+    packages: dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        total += int(self_us)
+        packages[name.strip().split(".")[0]] += int(self_us)
+
+    return total / 1000, {name: us / 1000 for name, us in packages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", action="append")
+    parser.add_argument("--budget-ms", type=float)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    over_budget = False
+    for module in args.module or list(BUDGETS):
+        runs = [measure(module) for _ in range(args.runs)]
+        total = statistics.median(total for total, _ in runs)
+        budget = args.budget_ms or BUDGETS.get(module, 1000)
+
+        print(f"{module}: {total:.0f} ms (budget {budget:.0f} ms)")
+        packages = runs[-1][1]
+        for name in sorted(packages, key=packages.get, reverse=True)[: args.top]:  # type:ignore
+            print(f"  {packages[name]:>8.1f} ms  {name}")
+
+        over_budget |= total > budget
+
+    if over_budget:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
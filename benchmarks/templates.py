@@ -0,0 +1,85 @@
+"""Render time of the tracking page and mail templates
+
+    python -m benchmarks.templates --renders 2000
+
+Each template is rendered with a new jinja environment per render, which is
+what Jinja2Templates built per request and fastapi-mail per message did, and
+with the shared precompiled environment of app.core.templating.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from app.core.templating import get_environment, precompile_templates
+from app.database.models import ShipmentStatus
+from app.utils import TEMPLATE_DIR
+
+NOW = datetime.now()
+
+CONTEXTS = {
+    "track.html": {
+        "id": uuid4(),
+        "content": "wireless headphones",
+        "partner": "fastship express",
+        "status": ShipmentStatus.in_transit,
+        "created_at": NOW - timedelta(days=2),
+        "estimated_delivery": NOW + timedelta(days=1),
+        "timeline": [
+            SimpleNamespace(
+                status=status,
+                created_at=NOW - timedelta(hours=hours),
+                description=f"scanned at location {10000 + hours}",
+            )
+            for hours, status in enumerate(
+                [ShipmentStatus.in_transit] * 8 + [ShipmentStatus.placed]
+            )
+        ],
+    },
+    "mail_placed.html": {"seller": "acme", "partner": "fastship express", "id": uuid4()},
+    "mail_out_for_delivery.html": {"verification_code": 123456},
+    "mail_delivered.html": {"seller": "acme", "review_url": "http://localhost:8000/review"},
+    "mail_cancelled.html": {},
+    "mail_reset_password.html": {"username": "acme", "reset_password_url": "http://localhost"},
+    "mail_verified_email.html": {"username": "acme", "verification_url": "http://localhost"},
+}
+
+
+def fresh_environment() -> Environment:
+    return Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=select_autoescape(["html"]),
+        enable_async=True,
+    )
+
+
+async def measure(name: str, renders: int, shared: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(renders):
+        environment = get_environment() if shared else fresh_environment()
+        await environment.get_template(name).render_async(CONTEXTS[name])
+    return (time.perf_counter() - start) / renders * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=2000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = precompile_templates()
+    print(f"precompiled {count} templates in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'template':<28}{'fresh us':>10}{'shared us':>11}{'speedup':>9}")
+    for name in CONTEXTS:
+        fresh = await measure(name, args.renders, shared=False)
+        shared = await measure(name, args.renders, shared=True)
+        print(f"{name:<28}{fresh:>10.1f}{shared:>11.1f}{fresh / shared:>8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
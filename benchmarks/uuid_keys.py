@@ -0,0 +1,95 @@
+"""Insert throughput and primary key size with uuid4 vs uuid7 keys
+
+    python -m benchmarks.uuid_keys --rows 500000 --batch-size 5000
+
+Fills a temporary table shaped like shipment_event once per key type and
+reports rows per second, the size of the primary key index and how many of
+its leaf pages are full (fewer means more page splits).
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import text
+
+from app.database.ids import uuid7
+from app.database.session import dispose_engine, get_engine
+
+GENERATORS = {"uuid4": uuid4, "uuid7": uuid7}
+
+
+async def run(name: str, rows: int, batch_size: int) -> tuple[float, int, float]:
+    generate = GENERATORS[name]
+    table = f"benchmark_{name}"
+
+    async with get_engine().connect() as conn:
+        await conn.execute(
+            text(
+                f"CREATE TEMP TABLE {table} ("
+                "id uuid PRIMARY KEY, created_at timestamp NOT NULL, "
+                "location integer NOT NULL, status text NOT NULL, shipment_id uuid NOT NULL)"
+            )
+        )
+        await conn.commit()
+
+        insert = text(
+            f"INSERT INTO {table} (id, created_at, location, status, shipment_id) "
+            "VALUES (:id, :created_at, :location, :status, :shipment_id)"
+        )
+        start = time.perf_counter()
+        for done in range(0, rows, batch_size):
+            await conn.execute(
+                insert,
+                [
+                    {
+                        "id": generate(),
+                        "created_at": datetime.now(),
+                        "location": 10001,
+                        "status": "in_transit",
+                        "shipment_id": uuid4(),
+                    }
+                    for _ in range(min(batch_size, rows - done))
+                ],
+            )
+            # one transaction per batch, like a stream of requests
+            await conn.commit()
+        elapsed = time.perf_counter() - start
+
+        index_size = await conn.scalar(
+            text(f"SELECT pg_relation_size('{table}_pkey')")
+        )
+        # average fill of the leaf pages, needs the pgstattuple extension
+        try:
+            density = await conn.scalar(
+                text(f"SELECT avg_leaf_density FROM pgstatindex('{table}_pkey')")
+            )
+        except Exception:
+            await conn.rollback()
+            density = float("nan")
+
+        await conn.execute(text(f"DROP TABLE {table}"))
+        await conn.commit()
+
+    return rows / elapsed, index_size, density
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    args = parser.parse_args()
+
+    get_engine().sync_engine.echo = False
+
+    print(f"{'key':<8}{'rows/s':>12}{'pkey MB':>10}{'leaf fill':>11}")
+    for name in GENERATORS:
+        rate, size, density = await run(name, args.rows, args.batch_size)
+        print(f"{name:<8}{rate:>12,.0f}{size / 2**20:>10.1f}{density:>10.1f}%")
+
+    await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
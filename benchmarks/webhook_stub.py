@@ -0,0 +1,99 @@
+"""Seller endpoint stand-in for webhook deliveries
+
+    python -m benchmarks.webhook_stub --secret <secret> --port 8099 --fail-rate 0.2
+
+Run the api and worker with WEBHOOK_ALLOW_PRIVATE_TARGETS=true (localhost is
+refused otherwise), register http://localhost:8099/ as a webhook of a seller, drive shipment
+updates and watch the worker. Every request is checked against the
+X-Fastship-Signature header, a share of them fails with 503 (or answers slowly)
+so retries with backoff can be observed. Prints received events per second,
+the average batch size and the failures every few seconds.
+"""
+import argparse
+import hmac
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.utils import sign_webhook
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = self.events = self.failed = self.invalid = 0
+
+    def take(self) -> tuple[int, int, int, int]:
+        with self.lock:
+            counts = (self.requests, self.events, self.failed, self.invalid)
+            self.requests = self.events = self.failed = self.invalid = 0
+        return counts
+
+
+def handler(secret: str, fail_rate: float, delay: float, stats: Stats):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            signature = self.headers.get("X-Fastship-Signature", "")
+            timestamp = signature.partition("t=")[2].partition(",")[0]
+
+            if delay:
+                time.sleep(delay)
+
+            if not hmac.compare_digest(signature, sign_webhook(secret, timestamp, body)):
+                with stats.lock:
+                    stats.invalid += 1
+                return self.answer(401)
+
+            if random.random() < fail_rate:
+                with stats.lock:
+                    stats.failed += 1
+                return self.answer(503)
+
+            with stats.lock:
+                stats.requests += 1
+                stats.events += len(json.loads(body)["events"])
+            self.answer(204)
+
+        def answer(self, status: int):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *_):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--secret", required=True)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--delay-ms", type=int, default=0)
+    parser.add_argument("--interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    stats = Stats()
+    server = ThreadingHTTPServer(
+        ("0.0.0.0", args.port),
+        handler(args.secret, args.fail_rate, args.delay_ms / 1000, stats),
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"{'events/s':>10}{'batch':>8}{'failed':>8}{'invalid':>9}")
+    try:
+        while True:
+            time.sleep(args.interval)
+            requests, events, failed, invalid = stats.take()
+            batch = events / requests if requests else 0
+            print(f"{events / args.interval:>10.1f}{batch:>8.1f}{failed:>8}{invalid:>9}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
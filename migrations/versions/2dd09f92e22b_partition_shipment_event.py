@@ -0,0 +1,86 @@
+"""partition shipment event by created_at
+
+Revision ID: 2dd09f92e22b
+Revises: 6b03a0998e58
+Create Date: 2025-09-17 09:41:07.514326
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2dd09f92e22b'
+down_revision: Union[str, Sequence[str], None] = '6b03a0998e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# monthly partitions created ahead of time, later ones by
+# `python -m app.database.maintenance create-partitions`
+MONTHS_AHEAD = 3
+
+COLUMNS = "id, created_at, location, status, description, shipment_id"
+
+
+def _create_event_table(name: str, partitioned: bool) -> None:
+    op.execute(f"""
+        CREATE TABLE {name} (
+            id UUID NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            location INTEGER NOT NULL,
+            status shipmentstatus NOT NULL,
+            description VARCHAR,
+            shipment_id UUID NOT NULL REFERENCES shipment (id),
+            PRIMARY KEY ({'id, created_at' if partitioned else 'id'})
+        ){' PARTITION BY RANGE (created_at)' if partitioned else ''}
+    """)
+
+
+def _add_month(day: date, months: int = 1) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE shipment_event RENAME TO shipment_event_legacy")
+    op.execute("ALTER TABLE shipment_event_legacy RENAME CONSTRAINT shipment_event_pkey TO shipment_event_legacy_pkey")
+    op.execute("UPDATE shipment_event_legacy SET created_at = now() WHERE created_at IS NULL")
+
+    # hot events, one partition per month
+    _create_event_table("shipment_event", partitioned=True)
+    op.execute("CREATE TABLE shipment_event_default PARTITION OF shipment_event DEFAULT")
+
+    oldest = op.get_bind().execute(sa.text("SELECT min(created_at) FROM shipment_event_legacy")).scalar()
+    start = (oldest or datetime.now()).date().replace(day=1)
+    end = _add_month(date.today().replace(day=1), MONTHS_AHEAD + 1)
+    while start < end:
+        upper = _add_month(start)
+        op.execute(
+            f"CREATE TABLE shipment_event_p{start:%Y_%m} PARTITION OF shipment_event "
+            f"FOR VALUES FROM ('{start}') TO ('{upper}')"
+        )
+        start = upper
+
+    # cold events of closed shipments, one partition per year
+    _create_event_table("shipment_event_archive", partitioned=True)
+    op.execute("CREATE TABLE shipment_event_archive_default PARTITION OF shipment_event_archive DEFAULT")
+
+    op.execute(f"INSERT INTO shipment_event ({COLUMNS}) SELECT {COLUMNS} FROM shipment_event_legacy")
+    op.drop_table('shipment_event_legacy')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE shipment_event RENAME TO shipment_event_partitioned")
+    op.execute("ALTER TABLE shipment_event_partitioned RENAME CONSTRAINT shipment_event_pkey TO shipment_event_partitioned_pkey")
+    _create_event_table("shipment_event", partitioned=False)
+    op.execute(f"INSERT INTO shipment_event ({COLUMNS}) SELECT {COLUMNS} FROM shipment_event_partitioned")
+    op.execute(f"INSERT INTO shipment_event ({COLUMNS}) SELECT {COLUMNS} FROM shipment_event_archive")
+
+    # partitions are dropped together with their parent
+    op.drop_table('shipment_event_partitioned')
+    op.drop_table('shipment_event_archive')
@@ -0,0 +1,55 @@
+"""add shipment closed_at and overdue scan index
+
+Revision ID: 4e7d2a9c61b8
+Revises: a83b47320fe5
+Create Date: 2025-09-25 09:41:18.530271
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e7d2a9c61b8'
+down_revision: Union[str, Sequence[str], None] = 'a83b47320fe5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('shipment', sa.Column('closed_at', postgresql.TIMESTAMP(), nullable=True))
+
+    # shipments already delivered or cancelled
+    op.execute("""
+        UPDATE shipment SET closed_at = closed.created_at
+        FROM (
+            SELECT shipment_id, max(created_at) AS created_at
+            FROM shipment_event
+            WHERE status IN ('delivered', 'cancelled')
+            GROUP BY shipment_id
+        ) closed
+        WHERE shipment.id = closed.shipment_id
+    """)
+
+    with op.get_context().autocommit_block():
+        # overdue scan, only open shipments are indexed
+        op.create_index(
+            'ix_shipment_open_estimated_delivery',
+            'shipment',
+            ['estimated_delivery'],
+            postgresql_where=sa.text('closed_at IS NULL'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_shipment_open_estimated_delivery', table_name='shipment', postgresql_concurrently=True, if_exists=True)
+
+    op.drop_column('shipment', 'closed_at')
@@ -0,0 +1,38 @@
+"""add shipment closed index
+
+Revision ID: 7d3f5a1e92c4
+Revises: f20c6d8e3a17
+Create Date: 2025-10-02 11:58:03.204519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3f5a1e92c4'
+down_revision: Union[str, Sequence[str], None] = 'f20c6d8e3a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        # archive batches walk closed shipments in (closed_at, id) order
+        op.create_index(
+            'ix_shipment_closed',
+            'shipment',
+            ['closed_at', 'id'],
+            postgresql_where=sa.text('closed_at IS NOT NULL'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_shipment_closed', table_name='shipment', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,68 @@
+"""add lookup indexes
+
+Revision ID: 81cd6cd33860
+Revises: 2dd09f92e22b
+Create Date: 2025-09-18 14:05:52.630117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '81cd6cd33860'
+down_revision: Union[str, Sequence[str], None] = '2dd09f92e22b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index, table, columns, unique)
+INDEXES = [
+    ('ix_seller_email', 'seller', ['email'], True),
+    ('ix_delivery_partner_email', 'delivery_partner', ['email'], True),
+    ('ix_shipment_seller_id', 'shipment', ['seller_id'], False),
+    ('ix_shipment_delivery_partner_id', 'shipment', ['delivery_partner_id'], False),
+    ('ix_shipment_tag_tag_id', 'shipment_tag', ['tag_id'], False),
+    ('ix_review_shipment_id', 'review', ['shipment_id'], True),
+    ('ix_tag_name', 'tag', ['name'], True),
+]
+
+# partitioned tables, CONCURRENTLY is not supported on the parent so the index is
+# created on the parent only and each partition's index is attached to it
+PARTITIONED_INDEXES = [
+    ('ix_shipment_event_shipment_id', 'shipment_event', ['shipment_id', 'created_at']),
+    ('ix_shipment_event_archive_shipment_id', 'shipment_event_archive', ['shipment_id', 'created_at']),
+]
+
+
+def _partitions(parent: str) -> list[str]:
+    return list(op.get_bind().execute(sa.text(
+        "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = CAST(:parent AS regclass)"
+    ), {"parent": parent}).scalars())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # unique indexes fail if duplicated emails / reviews / tags already exist,
+    # the failed index is left INVALID and must be dropped before retrying
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True, if_not_exists=True)
+
+        for name, table, columns in PARTITIONED_INDEXES:
+            op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} ({', '.join(columns)})")
+            for partition in _partitions(table):
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_shipment_id_idx ON {partition} ({', '.join(columns)})")
+                op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition}_shipment_id_idx")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in PARTITIONED_INDEXES:
+            # drops the attached partition indexes as well
+            op.drop_index(name, table_name=table, if_exists=True)
+
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,56 @@
+"""add shipment search indexes
+
+Revision ID: 99b4bd0f1553
+Revises: 81cd6cd33860
+Create Date: 2025-09-19 10:22:41.308514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '99b4bd0f1553'
+down_revision: Union[str, Sequence[str], None] = '81cd6cd33860'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# trigram indexes for substring search, ILIKE '%...%' can use them
+TRIGRAM_INDEXES = [
+    ('ix_shipment_content_trgm', 'content'),
+    ('ix_shipment_client_contact_email_trgm', 'client_contact_email'),
+    ('ix_shipment_client_contact_phone_trgm', 'client_contact_phone'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        # keyset pagination order, newest first
+        op.create_index('ix_shipment_created_at', 'shipment', ['created_at', 'id'], postgresql_concurrently=True, if_not_exists=True)
+
+        for name, column in TRIGRAM_INDEXES:
+            op.create_index(
+                name,
+                'shipment',
+                [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(TRIGRAM_INDEXES):
+            op.drop_index(name, table_name='shipment', postgresql_concurrently=True, if_exists=True)
+
+        op.drop_index('ix_shipment_created_at', table_name='shipment', postgresql_concurrently=True, if_exists=True)
+
+    # the extension is left installed, other objects may depend on it
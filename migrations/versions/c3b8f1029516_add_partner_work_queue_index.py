@@ -0,0 +1,35 @@
+"""add partner work queue index
+
+Revision ID: c3b8f1029516
+Revises: 99b4bd0f1553
+Create Date: 2025-09-19 16:48:03.771245
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3b8f1029516'
+down_revision: Union[str, Sequence[str], None] = '99b4bd0f1553'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+QUEUE_COLUMNS = ['delivery_partner_id', 'destination', 'created_at', 'id']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_shipment_delivery_partner_queue', 'shipment', QUEUE_COLUMNS, postgresql_concurrently=True, if_not_exists=True)
+        # the queue index starts with delivery_partner_id, the single column one is redundant
+        op.drop_index('ix_shipment_delivery_partner_id', table_name='shipment', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_shipment_delivery_partner_id', 'shipment', ['delivery_partner_id'], postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_shipment_delivery_partner_queue', table_name='shipment', postgresql_concurrently=True, if_exists=True)